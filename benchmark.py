@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Benchmark pipeline worker.py dengan media sintetis (ffmpeg lavfi), tanpa jaringan.
+
+    python benchmark.py --durations 30,120 --resolutions 640x360,1280x720 --output bench.json
+    python benchmark.py --baseline bench_baseline.json          # bandingkan, exit 1 kalau regresi
+    python benchmark.py --save-baseline bench_baseline.json     # simpan hasil sebagai baseline baru
+
+Input: testsrc2 + sine, atau fixture rekaman suara (--speech file.wav, di-loop sampai durasi).
+Translate diukur terhadap server stand-in lokal (LibreTranslate-compatible) dengan latency buatan.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import argparse
+import platform
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+FFMPEG = os.environ.get("FFMPEG", "ffmpeg")
+STAGES = ("import", "extract", "transcribe", "translate", "burn", "e2e")
+# Dependency berat yang seharusnya tidak ikut ter-load hanya karena `import worker`
+HEAVY_MODULES = ("requests", "bs4", "pysubs2", "numpy", "av", "faster_whisper", "ctranslate2")
+
+# ======================================
+# Input sintetis
+# ======================================
+def generate_media(directory, duration, resolution, speech=None):
+    """Video H.264 + AAC dari lavfi (di-cache per durasi/resolusi/fixture)"""
+    width, height = resolution.split("x")
+    tag = os.path.splitext(os.path.basename(speech))[0] if speech else "sine"
+    path = os.path.join(directory, f"synthetic_{resolution}_{duration}s_{tag}.mp4")
+    if os.path.exists(path):
+        return path
+
+    cmd = [FFMPEG, "-y", "-v", "error",
+           "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate=25:duration={duration}"]
+    if speech:
+        cmd += ["-stream_loop", "-1", "-i", speech]
+    else:
+        cmd += ["-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=44100:duration={duration}"]
+    cmd += [
+        "-map", "0:v", "-map", "1:a", "-t", str(duration),
+        "-c:v", "libx264", "-preset", "veryfast", "-g", "50", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "128k",
+        path,
+    ]
+    subprocess.run(cmd, check=True)
+    return path
+
+def synthetic_cues(worker, duration, every=2.5, length=1.8):
+    """Cue teks pendek tiap `every` detik — beban translate & burn sebanding durasi"""
+    cues = worker.Cues()
+    t = 0.5
+    n = 0
+    while t + length < duration:
+        n += 1
+        cues.append(int(t * 1000), int((t + length) * 1000), f"This is synthetic subtitle line number {n}.")
+        t += every
+    return cues
+
+# ======================================
+# Server translate stand-in
+# ======================================
+class StandInTranslator(BaseHTTPRequestHandler):
+    """POST /translate & /detect ala LibreTranslate; teks di-uppercase setelah `latency` detik"""
+    latency = 0.0
+    requests_served = 0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(self.latency)
+        type(self).requests_served += 1
+        if self.path == "/translate":
+            q = body.get("q", "")
+            result = {"translatedText": [t.upper() for t in q] if isinstance(q, list) else q.upper()}
+        elif self.path == "/detect":
+            result = [{"language": "en", "confidence": 90.0}]
+        else:
+            self.send_error(404)
+            return
+        data = json.dumps(result).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+def start_translator(latency):
+    StandInTranslator.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInTranslator)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+# ======================================
+# Pengukuran
+# ======================================
+def measure(worker, fn, *args, **kwargs):
+    """Jalankan fn; return (hasil, wall detik, cpu detik termasuk proses anak)"""
+    before = worker.usage_snapshot()
+    result = fn(*args, **kwargs)
+    usage = worker.usage_delta(before, worker.usage_snapshot())
+    return result, usage["wall_seconds"], usage["cpu_seconds"]
+
+def record(results, name, duration, resolution, stage, seconds, cpu_seconds, **extra):
+    entry = {
+        "input": name,
+        "duration": duration,
+        "resolution": resolution,
+        "stage": stage,
+        "seconds": round(seconds, 3),
+        "cpu_seconds": round(cpu_seconds, 3),
+        # < 1 berarti lebih cepat dari realtime
+        "realtime_factor": round(seconds / duration, 4),
+        **extra,
+    }
+    results.append(entry)
+    print(f"{name:>20} {stage:<11} {seconds:8.2f}s  cpu {cpu_seconds:8.2f}s  RTF {entry['realtime_factor']:.4f}")
+
+def run_e2e(media, translate_url, preset):
+    """Job penuh lewat worker.py di subprocess (sama seperti main.py menjalankannya)"""
+    job_id = f"bench-{uuid.uuid4().hex[:8]}"
+    job_dir = os.path.join(APP_DIR, "output", job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    with open(os.path.join(job_dir, "options.json"), "w", encoding="utf-8") as f:
+        json.dump({"preset": preset}, f)
+    env = dict(os.environ, LIBRETRANSLATE_URLS=translate_url, DOWNLOAD_CACHE="0")
+    started = time.time()
+    process = subprocess.run(
+        [sys.executable, os.path.join(APP_DIR, "worker.py"), job_id, media, "id", "0", "24"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    elapsed = time.time() - started
+    try:
+        with open(os.path.join(job_dir, "profile.json"), "r", encoding="utf-8") as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        profile = {}
+    shutil.rmtree(job_dir, ignore_errors=True)
+    cpu = profile.get("resources", {}).get("cpu_seconds", 0.0)
+    stages = {name: usage.get("wall_seconds") for name, usage in profile.get("stages", {}).items()}
+    return process.returncode, elapsed, cpu, stages
+
+def import_profile():
+    """`import worker` di interpreter baru dengan -X importtime: total, modul top-level terlambat, modul berat"""
+    code = f"import sys, json, worker; print(json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))"
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP_DIR, capture_output=True, text=True,
+    )
+    # Baris stderr: "import time: <self us> | <cumulative us> | <indentasi><modul>"
+    entries = []
+    for line in process.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[0].startswith("import time:") and parts[1].strip().isdigit():
+            entries.append((parts[2][1:], int(parts[1])))
+    top_level = [(name, us) for name, us in entries if not name.startswith(" ")]
+    worker_us = next((us for name, us in top_level if name == "worker"), 0)
+    slowest = sorted(top_level, key=lambda item: item[1], reverse=True)[:10]
+    return {
+        "ok": process.returncode == 0,
+        "seconds": round(worker_us / 1e6, 4),
+        "heavy_modules": json.loads(process.stdout or "[]") if process.returncode == 0 else None,
+        "slowest": [{"module": name, "seconds": round(us / 1e6, 4)} for name, us in slowest],
+    }
+
+# ======================================
+# Baseline
+# ======================================
+def compare(results, baseline, threshold):
+    """Bandingkan realtime factor per (input, stage); return list regresi"""
+    previous = {(r["input"], r["stage"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for entry in results:
+        old = previous.get((entry["input"], entry["stage"]))
+        if not old or not old.get("realtime_factor"):
+            continue
+        change = entry["realtime_factor"] / old["realtime_factor"] - 1
+        flag = "REGRESSION" if change > threshold else ""
+        print(f"{entry['input']:>20} {entry['stage']:<11} {old['realtime_factor']:.4f} → {entry['realtime_factor']:.4f} ({change:+.1%}) {flag}")
+        if flag:
+            regressions.append({**entry, "baseline_realtime_factor": old["realtime_factor"], "change": round(change, 4)})
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--durations", default="30,120", help="durasi input (detik), dipisah koma")
+    parser.add_argument("--resolutions", default="640x360,1280x720", help="resolusi input, dipisah koma")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"subset dari {','.join(STAGES)}")
+    parser.add_argument("--speech", help="fixture audio rekaman suara (default: sine)")
+    parser.add_argument("--preset", default=None, help="preset Whisper (default: DEFAULT_PRESET)")
+    parser.add_argument("--translate-latency", type=float, default=0.02, help="latency server stand-in (detik)")
+    parser.add_argument("--media-dir", default=os.path.join(APP_DIR, "output", "bench_media"))
+    parser.add_argument("--output", default="bench.json")
+    parser.add_argument("--baseline", help="file JSON hasil sebelumnya untuk dibandingkan")
+    parser.add_argument("--save-baseline", help="simpan hasil juga sebagai baseline baru")
+    parser.add_argument("--threshold", type=float, default=0.15, help="kenaikan RTF yang dianggap regresi")
+    args = parser.parse_args()
+
+    durations = [int(d) for d in args.durations.split(",") if d]
+    resolutions = [r for r in args.resolutions.split(",") if r]
+    stages = [s for s in args.stages.split(",") if s in STAGES]
+    os.makedirs(args.media_dir, exist_ok=True)
+
+    server, translate_url = start_translator(args.translate_latency)
+
+    report_import = None
+    if "import" in stages:
+        report_import = import_profile()
+        print(f"{'worker':>20} {'import':<11} {report_import['seconds']:8.3f}s  heavy: {report_import['heavy_modules']}")
+
+    sys.path.insert(0, APP_DIR)
+    import worker
+    from presets import DEFAULT_PRESET
+    preset = args.preset or DEFAULT_PRESET
+    bench_job = f"bench-{uuid.uuid4().hex[:8]}"
+    os.makedirs(os.path.join(APP_DIR, "output", bench_job), exist_ok=True)
+    with open(os.path.join(APP_DIR, "output", bench_job, "options.json"), "w", encoding="utf-8") as f:
+        json.dump({"preset": preset}, f)
+    worker.setup_job(bench_job, "", "id", False, "24")
+    worker.TRANSLATE_SERVERS = [translate_url]
+
+    results = []
+    try:
+        for duration in durations:
+            for resolution in resolutions:
+                media = generate_media(args.media_dir, duration, resolution, args.speech)
+                name = f"{resolution}-{duration}s"
+                cues = synthetic_cues(worker, duration)
+
+                audio = None
+                if "extract" in stages or "transcribe" in stages:
+                    audio, seconds, cpu = measure(worker, worker.extract_audio, media)
+                    if "extract" in stages:
+                        record(results, name, duration, resolution, "extract", seconds, cpu)
+
+                # Transcribe tidak tergantung resolusi → cukup sekali per durasi
+                if "transcribe" in stages and resolution == resolutions[0] and audio is not None:
+                    _, seconds, cpu = measure(worker, worker.transcribe_audio, audio)
+                    record(results, f"audio-{duration}s", duration, None, "transcribe", seconds, cpu, preset=worker.PRESET_NAME)
+
+                if "translate" in stages and resolution == resolutions[0]:
+                    served = StandInTranslator.requests_served
+                    _, seconds, cpu = measure(
+                        worker, worker.translate_subtitles, cues, "id", source_lang="en", source_probability=1.0
+                    )
+                    record(results, f"cues-{duration}s", duration, None, "translate", seconds, cpu,
+                           cues=len(cues), requests=StandInTranslator.requests_served - served)
+
+                if "burn" in stages:
+                    subs_file = cues.save(os.path.join(worker.JOB_DIR, "subs.ass"), style=worker.burn_style("24"))
+                    output = os.path.join(worker.JOB_DIR, "output.mp4")
+                    ok, seconds, cpu = measure(worker, worker.burn_subtitles, media, subs_file, output, cues)
+                    record(results, name, duration, resolution, "burn", seconds, cpu, mode=worker.BURN_MODE, ok=bool(ok))
+
+                if "e2e" in stages:
+                    code, seconds, cpu, stage_walls = run_e2e(media, translate_url, preset)
+                    record(results, name, duration, resolution, "e2e", seconds, cpu, ok=code == 0, stages=stage_walls)
+    finally:
+        server.shutdown()
+        shutil.rmtree(worker.JOB_DIR, ignore_errors=True)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "cpu_budget": worker.CPU_BUDGET,
+        },
+        "preset": preset,
+        "import": report_import,
+        "results": results,
+    }
+
+    regressions = []
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        old_import = (baseline.get("import") or {}).get("seconds")
+        # Abaikan noise di bawah 10 ms
+        if report_import and old_import and report_import["seconds"] - old_import > max(0.01, old_import * args.threshold):
+            print(f"{'worker':>20} {'import':<11} {old_import:.3f}s → {report_import['seconds']:.3f}s REGRESSION")
+            regressions.append({"stage": "import", "seconds": report_import["seconds"], "baseline_seconds": old_import})
+        report["baseline"] = args.baseline
+        report["regressions"] = regressions
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        shutil.copyfile(args.output, args.save_baseline)
+    print(f"Results written to {args.output}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
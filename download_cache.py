@@ -0,0 +1,202 @@
+# download_cache.py — cache media source per URL (dipakai bersama semua worker)
+
+import os
+import json
+import time
+import shutil
+import fcntl
+import hashlib
+import logging
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(__file__)
+CACHE_DIR = os.environ.get("DOWNLOAD_CACHE_DIR", os.path.join(APP_DIR, "cache"))
+CACHE_MAX_BYTES = int(float(os.environ.get("DOWNLOAD_CACHE_GB", "20")) * 1024 ** 3)
+# Entry tanpa URL langsung (mis. hasil yt-dlp) tidak bisa direvalidasi → hanya dipakai selama TTL
+CACHE_TTL = int(os.environ.get("DOWNLOAD_CACHE_TTL", str(6 * 3600)))
+
+# Parameter tracking yang tidak mengubah konten
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "ref", "ref_src")
+
+# ============================================
+# URL
+# ============================================
+def normalize_url(url):
+    """Normalisasi URL sumber: scheme/host lowercase, tanpa fragment & tracking, query terurut"""
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or "https").lower()
+    if scheme == "http":
+        scheme = "https"
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/") or "/"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(TRACKING_PARAMS)
+    )
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+def cache_key(url):
+    return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()[:32]
+
+# ============================================
+# LOCKING & ENTRY
+# ============================================
+@contextmanager
+def _locked():
+    """Lock eksklusif antar proses untuk semua perubahan di cache"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(os.path.join(CACHE_DIR, ".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _entry_dir(key):
+    return os.path.join(CACHE_DIR, key)
+
+def _read_meta(key):
+    try:
+        with open(os.path.join(_entry_dir(key), "meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_meta(key, meta):
+    path = os.path.join(_entry_dir(key), "meta.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+
+def _link_or_copy(src, dest):
+    """Hardlink kalau satu filesystem (instan, tanpa byte tambahan), kalau tidak copy"""
+    if os.path.exists(dest):
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+def _drop(key):
+    shutil.rmtree(_entry_dir(key), ignore_errors=True)
+
+# ============================================
+# REVALIDATION
+# ============================================
+def revalidate(meta, headers=None):
+    """Cek ke server apakah file yang di-cache masih sama (conditional HEAD)"""
+    if not meta.get("direct_url"):
+        return time.time() - meta.get("stored_at", 0) < CACHE_TTL
+    
+    import requests
+    
+    request_headers = dict(headers or {})
+    if meta.get("user_agent"):
+        request_headers["User-Agent"] = meta["user_agent"]
+    if meta.get("etag"):
+        request_headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        request_headers["If-Modified-Since"] = meta["last_modified"]
+    
+    try:
+        r = requests.head(meta["direct_url"], headers=request_headers, allow_redirects=True, timeout=15)
+    except Exception as e:
+        logger.warning(f"Cache revalidation failed: {e}")
+        return False
+    
+    if r.status_code == 304:
+        return True
+    if r.status_code != 200:
+        return False
+    
+    etag = r.headers.get("ETag")
+    last_modified = r.headers.get("Last-Modified")
+    size = int(r.headers.get("Content-Length", 0))
+    if meta.get("etag") and etag and etag != meta["etag"]:
+        return False
+    if meta.get("last_modified") and last_modified and last_modified != meta["last_modified"]:
+        return False
+    return size == meta["size"]
+
+# ============================================
+# PUBLIC API
+# ============================================
+def fetch(url, dest, headers=None):
+    """Salin media dari cache ke `dest` kalau ada dan masih valid. Return True kalau hit."""
+    key = cache_key(url)
+    meta = _read_meta(key)
+    media = os.path.join(_entry_dir(key), "media")
+    if not meta or not os.path.exists(media) or os.path.getsize(media) != meta.get("size"):
+        return False
+    
+    if not revalidate(meta, headers):
+        logger.info(f"Cache entry for {normalize_url(url)} is stale, dropping")
+        with _locked():
+            _drop(key)
+        return False
+    
+    with _locked():
+        if not os.path.exists(media):
+            return False
+        _link_or_copy(media, dest)
+        meta["last_used"] = time.time()
+        meta["hits"] = meta.get("hits", 0) + 1
+        _write_meta(key, meta)
+    
+    logger.info(f"✓ Cache hit for {normalize_url(url)} ({meta['size'] / 1024 / 1024:.1f} MB)")
+    return True
+
+def store(url, path, info=None):
+    """Simpan media hasil download ke cache beserta validator (direct URL, ETag, Last-Modified, size)"""
+    info = info or {}
+    key = cache_key(url)
+    size = os.path.getsize(path)
+    if size > CACHE_MAX_BYTES:
+        return False
+    
+    with _locked():
+        os.makedirs(_entry_dir(key), exist_ok=True)
+        media = os.path.join(_entry_dir(key), "media")
+        tmp = media + ".tmp"
+        _link_or_copy(path, tmp)
+        os.replace(tmp, media)
+        now = time.time()
+        _write_meta(key, {
+            "source_url": normalize_url(url),
+            "direct_url": info.get("url"),
+            "etag": info.get("etag"),
+            "last_modified": info.get("last_modified"),
+            "user_agent": info.get("user_agent"),
+            "size": size,
+            "stored_at": now,
+            "last_used": now,
+            "hits": 0,
+        })
+        _evict(CACHE_MAX_BYTES)
+    
+    logger.info(f"Stored {size / 1024 / 1024:.1f} MB in download cache ({key})")
+    return True
+
+def _evict(max_bytes):
+    """Hapus entry paling lama tidak dipakai (LRU) sampai total di bawah budget. Panggil dengan lock."""
+    entries = []
+    for key in os.listdir(CACHE_DIR):
+        meta = _read_meta(key)
+        if meta is None:
+            if os.path.isdir(_entry_dir(key)):
+                _drop(key)
+            continue
+        entries.append((meta.get("last_used", 0), key, meta.get("size", 0)))
+    
+    total = sum(size for _, _, size in entries)
+    for _, key, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        logger.info(f"Evicting cache entry {key} ({size / 1024 / 1024:.1f} MB)")
+        _drop(key)
+        total -= size
@@ -1,10 +1,14 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+from typing import Optional
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
-import subprocess, os, uuid, json, sys, time  # ← cukup pakai time, tidak butuh threading
+import subprocess, os, uuid, json, sys, time, re, shutil  # ← cukup pakai time, tidak butuh threading
+
+from presets import WHISPER_PRESETS, DEFAULT_PRESET, ENCODING_PROFILES, DEFAULT_ENCODING_PROFILE, BURN_MODES
+from download_cache import normalize_url
 
 APP_DIR = os.path.dirname(__file__)
 DATA_DIR = os.path.join(APP_DIR, "output")
@@ -53,9 +57,21 @@ def update_status(job_id, status, log=""):
 # ==========================
 # Jalankan worker (simple)
 # ==========================
-def run_worker(job_id: str, src: str, target: str, size: int, is_url: bool):
+# job_id → Popen worker yang di-start proses ini (untuk cek worker masih hidup)
+WORKERS = {}
+
+def worker_alive(job_id: str) -> bool:
+    """Worker masih jalan? poll() sekalian me-reap proses yang sudah exit (tidak jadi zombie)"""
+    process = WORKERS.get(job_id)
+    if process is None or process.poll() is not None:
+        WORKERS.pop(job_id, None)
+        return False
+    return True
+
+def run_worker(job_id: str, src: str, target: str, size: int, is_url: bool, options: dict = None):
     """
     Start worker.py sebagai proses terpisah.
+    Opsi tambahan per job (preset, dll) ditulis ke options.json, argumen job ke job.json (untuk retry).
     Kalau gagal start → status job jadi 'failed'.
     """
     worker_path = os.path.join(APP_DIR, "worker.py")
@@ -63,6 +79,11 @@ def run_worker(job_id: str, src: str, target: str, size: int, is_url: bool):
     os.makedirs(job_dir, exist_ok=True)
     log_file = os.path.join(job_dir, "worker_start.log")
 
+    with open(os.path.join(job_dir, "options.json"), "w", encoding="utf-8") as f:
+        json.dump(options or {}, f, ensure_ascii=False, indent=2)
+    with open(os.path.join(job_dir, "job.json"), "w", encoding="utf-8") as f:
+        json.dump({"src": src, "target": target, "size": size, "is_url": is_url}, f, ensure_ascii=False, indent=2)
+
     cmd = [
         PYTHON,
         worker_path,
@@ -80,7 +101,7 @@ def run_worker(job_id: str, src: str, target: str, size: int, is_url: bool):
             f.write("CMD: " + " ".join(cmd) + "\n")
 
         # jalankan worker di background
-        subprocess.Popen(
+        WORKERS[job_id] = subprocess.Popen(
             cmd,
             cwd=APP_DIR,
         )
@@ -90,6 +111,77 @@ def run_worker(job_id: str, src: str, target: str, size: int, is_url: bool):
         update_status(job_id, "failed", f"Worker start error: {e}")
         raise
 
+def check_preset(preset: str):
+    if preset not in WHISPER_PRESETS:
+        raise HTTPException(400, f"Preset tidak dikenal: {preset} (pilihan: {', '.join(WHISPER_PRESETS)})")
+
+OUTPUT_KINDS = ("video", "subtitles", "hls")
+
+def check_output(output: str):
+    if output not in OUTPUT_KINDS:
+        raise HTTPException(400, f"Output tidak dikenal: {output} (pilihan: {', '.join(OUTPUT_KINDS)})")
+
+# Default per tenant dari env (sama dengan default worker)
+DEFAULT_ENCODING = os.environ.get("ENCODING_PROFILE", DEFAULT_ENCODING_PROFILE)
+
+def check_encoding(encoding: str):
+    if encoding not in ENCODING_PROFILES:
+        raise HTTPException(400, f"Encoding tidak dikenal: {encoding} (pilihan: {', '.join(ENCODING_PROFILES)})")
+
+def check_burn_mode(burn_mode: Optional[str]):
+    if burn_mode is not None and burn_mode not in BURN_MODES:
+        raise HTTPException(400, f"Burn mode tidak dikenal: {burn_mode} (pilihan: {', '.join(BURN_MODES)})")
+
+def job_options(preset, output, encoding, progressive=None, preview=None, burn_mode=None):
+    """Isi options.json; opsi tuning yang tidak diisi dibiarkan ke default worker (env)"""
+    options = {"preset": preset, "output": output, "encoding": encoding}
+    tuning = {"progressive": progressive, "preview": preview, "burn_mode": burn_mode}
+    options.update({name: value for name, value in tuning.items() if value is not None})
+    return options
+
+# ==========================
+# Single-flight: job identik yang sedang jalan
+# ==========================
+# key (source, target, style, preset, output, encoding, progressive, preview, burn_mode) → job_id leader
+INFLIGHT = {}
+FINAL_STATUSES = ("done", "failed", "cancelled", "error")
+
+def source_url(embed: str) -> str:
+    """URL sumber dari input user (URL langsung atau kode embed iframe) — sama seperti worker"""
+    url = embed.strip()
+    if not url.startswith("http"):
+        match = re.search(r'src=[\'"]([^\'"]+)', embed)
+        url = match.group(1) if match else url
+    return url
+
+def job_status(job_id: str) -> str:
+    status_file = os.path.join(DATA_DIR, job_id, "status.json")
+    try:
+        with open(status_file, "r", encoding="utf-8") as f:
+            return json.load(f).get("status", "queued")
+    except Exception:
+        return "queued"
+
+def find_inflight(key):
+    """Job leader yang masih jalan untuk key ini (None kalau tidak ada / sudah selesai / worker mati)"""
+    leader = INFLIGHT.get(key)
+    if leader and job_status(leader) not in FINAL_STATUSES and not reap_worker(leader):
+        return leader
+    INFLIGHT.pop(key, None)
+    return None
+
+def reap_worker(job_id: str) -> bool:
+    """
+    True kalau worker job ini sudah exit. Worker yang mati tanpa status akhir (SIGKILL/OOM)
+    ditandai gagal supaya joiner tidak menunggu job yang tidak akan selesai.
+    """
+    if worker_alive(job_id):
+        return False
+    # Status dibaca setelah worker pasti sudah exit (status akhir ditulis sebelum exit)
+    if job_status(job_id) not in FINAL_STATUSES:
+        update_status(job_id, "failed", "Worker berhenti tanpa menyelesaikan job")
+    return True
+
 # ==========================
 # /api/upload : upload file
 # ==========================
@@ -98,9 +190,19 @@ async def upload_video(
     file: UploadFile = File(...),
     target: str = Form("id"),
     size: int = Form(26),
+    preset: str = Form(DEFAULT_PRESET),
+    output: str = Form("video"),
+    encoding: str = Form(DEFAULT_ENCODING),
+    progressive: Optional[bool] = Form(None),
+    preview: Optional[bool] = Form(None),
+    burn_mode: Optional[str] = Form(None),
 ):
     if not file.filename:
         raise HTTPException(400, "No file uploaded")
+    check_preset(preset)
+    check_output(output)
+    check_encoding(encoding)
+    check_burn_mode(burn_mode)
 
     job_id = str(uuid.uuid4())
     job_dir = os.path.join(DATA_DIR, job_id)
@@ -114,7 +216,7 @@ async def upload_video(
     update_status(job_id, "queued", "File uploaded")
 
     # Start worker dengan file lokal
-    run_worker(job_id, filepath, target, size, is_url=False)
+    run_worker(job_id, filepath, target, size, is_url=False, options=job_options(preset, output, encoding, progressive, preview, burn_mode))
 
     return {"job_id": job_id}
 
@@ -126,15 +228,33 @@ async def start_url(
     embed: str = Form(...),
     target: str = Form("id"),
     size: int = Form(26),
+    preset: str = Form(DEFAULT_PRESET),
+    output: str = Form("video"),
+    encoding: str = Form(DEFAULT_ENCODING),
+    progressive: Optional[bool] = Form(None),
+    preview: Optional[bool] = Form(None),
+    burn_mode: Optional[str] = Form(None),
 ):
     if not embed.strip():
         raise HTTPException(400, "URL kosong")
+    check_preset(preset)
+    check_output(output)
+    check_encoding(encoding)
+    check_burn_mode(burn_mode)
+
+    # Submit identik ikut job yang sedang jalan (progress & output sama).
+    # Tidak ada await antara cek dan daftar, jadi aman di satu event loop.
+    key = (normalize_url(source_url(embed)), target, size, preset, output, encoding, progressive, preview, burn_mode)
+    leader = find_inflight(key)
+    if leader:
+        return {"job_id": leader, "joined": True}
 
     job_id = str(uuid.uuid4())
+    INFLIGHT[key] = job_id
     update_status(job_id, "queued", "URL diterima")
 
     # Start worker dengan URL
-    run_worker(job_id, embed, target, size, is_url=True)
+    run_worker(job_id, embed, target, size, is_url=True, options=job_options(preset, output, encoding, progressive, preview, burn_mode))
 
     return {"job_id": job_id}
 
@@ -143,6 +263,8 @@ async def start_url(
 # ==========================
 @app.get("/api/status/{job_id}")
 async def check_status(job_id: str):
+    if job_id in WORKERS:
+        reap_worker(job_id)
     status_file = os.path.join(DATA_DIR, job_id, "status.json")
     if not os.path.exists(status_file):
         return {"status": "queued", "log": "Menunggu..."}
@@ -153,12 +275,63 @@ async def check_status(job_id: str):
     except Exception:
         return {"status": "error", "log": "Status corrupt"}
 
+# ==========================
+# /api/jobs/{job_id}/retry : jalankan ulang job gagal / dibatalkan di directory yang sama
+# ==========================
+@app.post("/api/jobs/{job_id}/retry")
+async def retry_job(job_id: str):
+    job_dir = os.path.join(DATA_DIR, job_id)
+    try:
+        with open(os.path.join(job_dir, "job.json"), "r", encoding="utf-8") as f:
+            job = json.load(f)
+        with open(os.path.join(job_dir, "options.json"), "r", encoding="utf-8") as f:
+            options = json.load(f)
+    except (OSError, ValueError):
+        raise HTTPException(404, "Job tidak ditemukan")
+    if job_status(job_id) == "done" or worker_alive(job_id):
+        raise HTTPException(409, "Job masih berjalan atau sudah selesai")
+    if not job["is_url"] and not os.path.exists(job["src"]):
+        raise HTTPException(409, "File upload sudah dihapus, upload ulang")
+
+    # Download ranged yang terputus dilanjutkan dari progress map yang tertinggal di job dir
+    update_status(job_id, "queued", "Retry")
+    run_worker(job_id, job["src"], job["target"], job["size"], is_url=job["is_url"], options=options)
+    return {"job_id": job_id, "retried": True}
+
+# ==========================
+# DELETE /api/jobs/{job_id} : hapus job beserta semua file-nya (termasuk partial download untuk resume)
+# ==========================
+@app.delete("/api/jobs/{job_id}")
+async def delete_job(job_id: str):
+    job_dir = os.path.join(DATA_DIR, job_id)
+    if not re.fullmatch(r"[\w-]+", job_id) or not os.path.isdir(job_dir):
+        raise HTTPException(404, "Job tidak ditemukan")
+    if worker_alive(job_id):
+        raise HTTPException(409, "Job masih berjalan")
+
+    for key, leader in list(INFLIGHT.items()):
+        if leader == job_id:
+            INFLIGHT.pop(key, None)
+    shutil.rmtree(job_dir, ignore_errors=True)
+    return {"job_id": job_id, "deleted": True}
+
 # ==========================
 # /api/output/{job_id}
 # ==========================
 @app.get("/api/output/{job_id}")
 async def download_result(job_id: str):
     output_path = os.path.join(DATA_DIR, job_id, "output.mp4")
+    srt_path = os.path.join(DATA_DIR, job_id, "output.srt")
+    playlist_path = os.path.join(DATA_DIR, job_id, "hls", "index.m3u8")
+
+    # Job HLS: output = playlist (segment di-resolve relatif terhadap URL playlist)
+    if not os.path.exists(output_path) and os.path.exists(playlist_path):
+        return RedirectResponse(f"/api/jobs/{job_id}/hls/index.m3u8")
+
+    # Job subtitle saja
+    if not os.path.exists(output_path) and os.path.exists(srt_path):
+        filename = f"{job_id.replace('-', '')}_subtitle.srt"
+        return FileResponse(srt_path, media_type="application/x-subrip", filename=filename)
 
     if not os.path.exists(output_path):
         raise HTTPException(404, "Belum selesai")
@@ -166,6 +339,100 @@ async def download_result(job_id: str):
     filename = f"{job_id.replace('-', '')}_subtitle.mp4"
     return FileResponse(output_path, media_type="video/mp4", filename=filename)
 
+# ==========================
+# /api/jobs/{job_id}/preview
+# ==========================
+@app.get("/api/jobs/{job_id}/preview")
+async def download_preview(job_id: str):
+    preview_path = os.path.join(DATA_DIR, job_id, "preview.mp4")
+
+    if not os.path.exists(preview_path):
+        raise HTTPException(404, "Preview belum siap")
+
+    return FileResponse(preview_path, media_type="video/mp4")
+
+# ==========================
+# /api/jobs/{job_id}/hls/{name} : playlist & segment (tersedia selama burn)
+# ==========================
+HLS_MEDIA_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+    ".m4s": "video/iso.segment",
+    ".mp4": "video/mp4",
+}
+
+@app.get("/api/jobs/{job_id}/hls/{name}")
+async def hls_file(job_id: str, name: str):
+    ext = os.path.splitext(name)[1]
+    if not re.fullmatch(r"[\w.-]+", name) or name.startswith(".") or ext not in HLS_MEDIA_TYPES:
+        raise HTTPException(404, "File tidak ada")
+
+    path = os.path.join(DATA_DIR, job_id, "hls", name)
+    if not os.path.exists(path):
+        raise HTTPException(404, "Belum tersedia")
+
+    # Playlist event terus bertambah sampai #EXT-X-ENDLIST → jangan di-cache;
+    # segment tidak pernah berubah setelah ditulis
+    with open(path, "rb") as f:
+        growing = ext == ".m3u8" and b"#EXT-X-ENDLIST" not in f.read()
+    cache = "no-cache" if growing else "public, max-age=86400"
+    return FileResponse(path, media_type=HLS_MEDIA_TYPES[ext], headers={"Cache-Control": cache})
+
+# ==========================
+# /api/stats/resources : agregat resource semua job
+# ==========================
+RESOURCE_FIELDS = ("wall_seconds", "cpu_seconds", "peak_rss_mb", "read_bytes", "write_bytes")
+
+def summarize(values):
+    """total / mean / p95 / max untuk satu metrik"""
+    values = sorted(values)
+    p95 = values[min(len(values) - 1, int(round(0.95 * (len(values) - 1))))]
+    return {
+        "total": round(sum(values), 2),
+        "mean": round(sum(values) / len(values), 2),
+        "p95": round(p95, 2),
+        "max": round(values[-1], 2),
+    }
+
+def aggregate_usage(entries):
+    """List dict usage (dari profile.json) → ringkasan per metrik"""
+    return {
+        field: summarize([entry[field] for entry in entries if field in entry])
+        for field in RESOURCE_FIELDS
+        if any(field in entry for entry in entries)
+    }
+
+@app.get("/api/stats/resources")
+async def resource_stats():
+    jobs, stages = [], {}
+    media_seconds = cpu_for_media = 0.0
+    for job_id in os.listdir(DATA_DIR):
+        try:
+            with open(os.path.join(DATA_DIR, job_id, "profile.json"), "r", encoding="utf-8") as f:
+                profile = json.load(f)
+        except Exception:
+            continue
+        if "resources" not in profile:
+            continue
+        jobs.append(profile["resources"])
+        for name, usage in profile.get("stages", {}).items():
+            # Peak seumur proses (kernel tanpa clear_refs) bukan peak stage → tidak ikut agregat RSS
+            if usage.get("peak_rss_lifetime"):
+                usage = {k: v for k, v in usage.items() if k != "peak_rss_mb"}
+            stages.setdefault(name, []).append(usage)
+        # CPU per detik media → dasar capacity planning & pricing
+        audio_seconds = profile.get("transcribe", {}).get("audio_seconds")
+        if audio_seconds:
+            media_seconds += audio_seconds
+            cpu_for_media += profile["resources"].get("cpu_seconds", 0.0)
+
+    return {
+        "jobs": len(jobs),
+        "job": aggregate_usage(jobs),
+        "stages": {name: dict(aggregate_usage(usages), jobs=len(usages)) for name, usages in stages.items()},
+        "cpu_seconds_per_media_second": round(cpu_for_media / media_seconds, 3) if media_seconds else None,
+    }
+
 # ==========================
 # Root
 # ==========================
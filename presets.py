@@ -0,0 +1,116 @@
+# presets.py — setting Whisper per job (dipakai main.py & worker.py)
+
+# ============================================
+# WHISPER PRESETS
+# ============================================
+# Tiap preset menentukan model, compute type, decoding, VAD dan jumlah
+# thread per instance ctranslate2 (pool worker = CPU_BUDGET // cpu_threads).
+# Preset dengan "two_pass" decode greedy dulu, lalu decode ulang dengan beam
+# search hanya segment yang avg_logprob / compression_ratio-nya di luar batas.
+WHISPER_PRESETS = {
+    # Greedy decoding — throughput maksimal untuk backfill massal
+    "fast": {
+        "model": "tiny",
+        "compute_type": "int8",
+        "beam_size": 1,
+        "best_of": 1,
+        "patience": 1,
+        "vad_parameters": {"min_silence_duration_ms": 300},
+        "cpu_threads": 1,
+    },
+    # Setting lama (tiny + beam search 5)
+    "balanced": {
+        "model": "tiny",
+        "compute_type": "int8",
+        "beam_size": 5,
+        "best_of": 5,
+        "patience": 1,
+        "vad_parameters": {"min_silence_duration_ms": 500},
+        "cpu_threads": 2,
+    },
+    # Model lebih besar untuk job premium
+    "accurate": {
+        "model": "small",
+        "compute_type": "int8",
+        "beam_size": 5,
+        "best_of": 5,
+        "patience": 1,
+        "vad_parameters": {"min_silence_duration_ms": 500, "speech_pad_ms": 400},
+        "cpu_threads": 4,
+    },
+    # Two-pass: greedy dulu, beam search hanya untuk segment yang kurang yakin
+    "adaptive": {
+        "model": "tiny",
+        "compute_type": "int8",
+        "beam_size": 5,
+        "best_of": 5,
+        "patience": 1,
+        "vad_parameters": {"min_silence_duration_ms": 500},
+        "cpu_threads": 2,
+        "two_pass": True,
+        "logprob_threshold": -0.8,
+        "compression_ratio_threshold": 2.2,
+    },
+}
+
+DEFAULT_PRESET = "balanced"
+
+# ============================================
+# ENCODING PROFILES (burn)
+# ============================================
+# max_short_side / max_fps: batas output (sisi pendek, jadi video portrait ikut
+# terbatas dengan benar; source yang lebih kecil tidak di-upscale).
+# target_ratio: target waktu encode / durasi video, max_encode_seconds: batas
+# absolut untuk video panjang. Preset x264 dipilih dari estimasi throughput
+# supaya target itu terpenuhi; crf = kualitas dasar (disesuaikan resolusi).
+ENCODING_PROFILES = {
+    # Ditonton di HP — 720p30, encode secepat mungkin
+    "mobile": {
+        "max_short_side": 720,
+        "max_fps": 30,
+        "crf": 24,
+        "target_ratio": 0.5,
+        "max_encode_seconds": 900,
+    },
+    # Default: 1080p, fps source sampai 30
+    "standard": {
+        "max_short_side": 1080,
+        "max_fps": 30,
+        "crf": 23,
+        "target_ratio": 1.0,
+        "max_encode_seconds": 1800,
+    },
+    # Resolusi & fps source, boleh encode lebih lama demi kualitas
+    "source": {
+        "max_short_side": None,
+        "max_fps": None,
+        "crf": 21,
+        "target_ratio": 2.0,
+        "max_encode_seconds": 3600,
+    },
+}
+
+DEFAULT_ENCODING_PROFILE = "standard"
+
+# Estimasi throughput libx264 per thread (pixel/detik), dari preset tercepat ke terlambat
+X264_PRESET_SPEED = [
+    ("ultrafast", 80e6),
+    ("superfast", 55e6),
+    ("veryfast", 30e6),
+    ("faster", 18e6),
+    ("fast", 12e6),
+    ("medium", 9e6),
+]
+
+# libx264 tidak scale linear dengan jumlah thread (lookahead, sinkronisasi antar baris frame):
+# throughput efektif ~ speed x threads ** X264_THREAD_SCALING
+X264_THREAD_SCALING = 0.7
+
+# Preset paling lambat yang boleh dipilih otomatis (estimasi bisa meleset, medium ke atas terlalu mahal)
+X264_SLOWEST_AUTO_PRESET = "fast"
+
+# ============================================
+# BURN MODES
+# ============================================
+# Strategi burn (worker.burn_subtitles); opsi job "burn_mode" divalidasi main.py.
+BURN_MODES = ("auto", "single", "parallel", "smart")
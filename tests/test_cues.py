@@ -0,0 +1,107 @@
+# Test model Cues (worker.Cues): pembulatan ms, serialisasi SRT/VTT, urutan setelah konsolidasi/split
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import worker
+
+
+class ClockTest(unittest.TestCase):
+
+    def test_hour_boundary(self):
+        self.assertEqual(worker._clock(3599999), "00:59:59,999")
+        self.assertEqual(worker._clock(3600000), "01:00:00,000")
+        self.assertEqual(worker._clock(3600001, "."), "01:00:00.001")
+
+    def test_segments_round_to_nearest_ms(self):
+        # 3599.9996 s dibulatkan ke atas melewati batas jam, bukan dipotong ke 59:59,999
+        cues = worker.Cues.from_segments([(3599.9996, 3600.0004, "a"), (3599.9994, 7199.9999, "b")])
+
+        self.assertEqual(list(cues.starts), [3600000, 3599999])
+        self.assertEqual(list(cues.ends), [3600000, 7200000])
+        self.assertIn("01:00:00,000 --> 01:00:00,000", cues.to_srt())
+        self.assertIn("00:59:59,999 --> 02:00:00,000", cues.to_srt())
+
+
+class SerializeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cues = worker.Cues([1500, 3600000], [2250, 3601005], ["halo", "dunia"])
+
+    def test_srt_uses_comma(self):
+        self.assertEqual(
+            self.cues.to_srt(),
+            "1\n00:00:01,500 --> 00:00:02,250\nhalo\n\n"
+            "2\n01:00:00,000 --> 01:00:01,005\ndunia\n\n",
+        )
+
+    def test_vtt_uses_dot(self):
+        self.assertEqual(
+            self.cues.to_vtt(),
+            "WEBVTT\n\n"
+            "00:00:01.500 --> 00:00:02.250\nhalo\n\n"
+            "01:00:00.000 --> 01:00:01.005\ndunia\n\n",
+        )
+
+    def test_round_trip(self):
+        for data in (self.cues.to_srt(), self.cues.to_vtt()):
+            parsed = worker.Cues.parse_srt(data)
+            self.assertEqual(list(parsed.starts), list(self.cues.starts))
+            self.assertEqual(list(parsed.ends), list(self.cues.ends))
+            self.assertEqual(parsed.texts, self.cues.texts)
+
+
+class OrderingTest(unittest.TestCase):
+
+    def assertOrdered(self, cues):
+        for start, end in zip(cues.starts, cues.ends):
+            self.assertLessEqual(start, end)
+        for prev_end, start in zip(cues.ends, cues.starts[1:]):
+            self.assertLessEqual(prev_end, start)
+
+    def test_consolidate_keeps_order(self):
+        cues = worker.Cues(
+            [0, 800, 1600, 5000, 5300, 9000],
+            [700, 1500, 2400, 5200, 6100, 9500],
+            ["satu", "dua", "tiga.", "empat", "lima", "enam"],
+        )
+
+        merged = worker.consolidate_cues(cues, max_gap_ms=600, max_ms=6000, max_chars=84)
+
+        self.assertOrdered(merged)
+        self.assertEqual(merged.texts, ["satu dua tiga.", "empat lima", "enam"])
+        self.assertEqual(list(merged.starts), [0, 5000, 9000])
+        self.assertEqual(list(merged.ends), [2400, 6100, 9500])
+
+    def test_split_keeps_order_and_span(self):
+        text = " ".join(f"kata{i}" for i in range(40))
+        cues = worker.Cues([1000, 20000], [7000, 21000], [text, "pendek"])
+
+        split = worker.split_long_cues(cues, max_chars=60)
+
+        self.assertOrdered(split)
+        self.assertGreater(len(split), 2)
+        self.assertTrue(all(len(t) <= 60 for t in split.texts))
+        self.assertEqual(" ".join(split.texts[:-1]), text)
+        # Potongan menutup rentang cue asli tanpa celah
+        self.assertEqual(split.starts[0], 1000)
+        self.assertEqual(split.ends[len(split) - 2], 7000)
+        for prev_end, start in zip(split.ends[:len(split) - 2], split.starts[1:len(split) - 1]):
+            self.assertEqual(prev_end, start)
+        self.assertEqual((split.starts[-1], split.ends[-1], split.texts[-1]), (20000, 21000, "pendek"))
+
+    def test_srt_numbering_after_split(self):
+        cues = worker.split_long_cues(
+            worker.consolidate_cues(worker.Cues([0, 500], [400, 900], ["a " * 30, "b " * 30])),
+            max_chars=20,
+        )
+
+        numbers = [block.split("\n", 1)[0] for block in cues.to_srt().strip().split("\n\n")]
+        self.assertEqual(numbers, [str(i) for i in range(1, len(cues) + 1)])
+        self.assertOrdered(worker.Cues.parse_srt(cues.to_srt()))
+
+
+if __name__ == "__main__":
+    unittest.main()
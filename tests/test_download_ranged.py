@@ -0,0 +1,176 @@
+# Test downloader ranged (worker.download_ranged) terhadap HTTP server lokal
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import worker
+
+PAYLOAD = os.urandom(3 * 1024 * 1024 + 123)
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serve PAYLOAD dengan dukungan Range; perilaku diatur lewat atribut server"""
+
+    def log_message(self, *args):
+        pass
+
+    def _headers(self, status, length, extra=()):
+        self.send_response(status)
+        self.send_header("Content-Length", str(length))
+        self.send_header("ETag", '"payload-v1"')
+        if self.server.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        for name, value in extra:
+            self.send_header(name, value)
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._headers(200, len(PAYLOAD))
+
+    def do_GET(self):
+        header = self.headers.get("Range")
+        if not header or not self.server.ranges:
+            self._headers(200, len(PAYLOAD))
+            self.wfile.write(PAYLOAD)
+            return
+
+        start, end = header.split("=", 1)[1].split("-")
+        start, end = int(start), int(end or len(PAYLOAD) - 1)
+        body = PAYLOAD[start:end + 1]
+        with self.server.lock:
+            self.server.requests.append((start, end))
+            self.server.served += len(body)
+        self._headers(206, len(body), [("Content-Range", f"bytes {start}-{end}/{len(PAYLOAD)}")])
+        if self.server.truncate_from is not None and start <= self.server.truncate_from <= end:
+            # Putus di tengah range (server tetap klaim Content-Length penuh)
+            self.wfile.write(body[:self.server.truncate_from - start])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+class DownloadRangedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "video_0.mp4")
+        self.progress = self.path + ".progress.json"
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+        self.server.ranges = True
+        self.server.truncate_from = None
+        self.server.requests = []
+        self.server.served = 0
+        self.server.lock = threading.Lock()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/video.mp4"
+
+        # Range kecil supaya payload 3 MB dipecah ke beberapa koneksi; retry cepat
+        self.saved = {
+            name: getattr(worker, name)
+            for name in ("DOWNLOAD_MIN_RANGE", "DOWNLOAD_SINK_BLOCK", "DOWNLOAD_RETRIES", "DOWNLOAD_RETRY_DELAY", "STATUS")
+        }
+        worker.DOWNLOAD_MIN_RANGE = 512 * 1024
+        worker.DOWNLOAD_SINK_BLOCK = 256 * 1024
+        worker.DOWNLOAD_RETRIES = 1
+        worker.DOWNLOAD_RETRY_DELAY = 0.0
+        worker.STATUS = os.path.join(self.tmp, "status.json")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        for name, value in self.saved.items():
+            setattr(worker, name, value)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def read(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def test_parallel_download(self):
+        info = worker.download_ranged(self.url, self.path, {}, connections=4)
+
+        self.assertIsNotNone(info)
+        self.assertEqual(info["size"], len(PAYLOAD))
+        self.assertEqual(info["connections"], 4)
+        self.assertGreater(info["bytes_per_second"], 0)
+        self.assertEqual(self.read(), PAYLOAD)
+        self.assertFalse(os.path.exists(self.progress))
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_sink_gets_file_order_blocks(self):
+        class Sink:
+            def __init__(self):
+                self.data = bytearray()
+
+            def feed(self, chunk):
+                self.data += chunk
+
+        sink = Sink()
+        info = worker.download_ranged(self.url, self.path, {}, connections=4, sink=sink)
+
+        self.assertIsNotNone(info)
+        self.assertEqual(info["connections"], 4)
+        self.assertEqual(bytes(sink.data), PAYLOAD)
+        self.assertEqual(self.read(), PAYLOAD)
+        # Blok kecil berurutan, bukan 4 range besar
+        block = worker.DOWNLOAD_SINK_BLOCK
+        starts = sorted(start for start, _ in self.server.requests)
+        self.assertEqual(starts, list(range(0, len(PAYLOAD), block)))
+
+    def test_no_range_support(self):
+        self.server.ranges = False
+
+        self.assertIsNone(worker.download_ranged(self.url, self.path, {}, connections=4))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_interrupted_range_keeps_progress(self):
+        self.server.truncate_from = len(PAYLOAD) // 2 + 1000
+
+        self.assertIsNone(worker.download_ranged(self.url, self.path, {}, connections=4))
+        # File sudah dialokasikan penuh → yang gagal harus terdeteksi dari progress, bukan ukuran file
+        self.assertEqual(os.path.getsize(self.path), len(PAYLOAD))
+        with open(self.progress, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        self.assertEqual(saved["size"], len(PAYLOAD))
+        written = sum(done for _, _, done in saved["ranges"])
+        self.assertLess(written, len(PAYLOAD))
+
+    def test_resume_fetches_only_missing_bytes(self):
+        self.server.truncate_from = len(PAYLOAD) // 2 + 1000
+        self.assertIsNone(worker.download_ranged(self.url, self.path, {}, connections=4))
+        with open(self.progress, "r", encoding="utf-8") as f:
+            missing = len(PAYLOAD) - sum(done for _, _, done in json.load(f)["ranges"])
+
+        # Worker restart: server normal lagi, hanya sisa range yang diminta
+        self.server.truncate_from = None
+        self.server.served = 0
+        info = worker.download_ranged(self.url, self.path, {}, connections=4)
+
+        self.assertIsNotNone(info)
+        self.assertEqual(self.server.served, missing)
+        self.assertEqual(self.read(), PAYLOAD)
+        self.assertFalse(os.path.exists(self.progress))
+
+    def test_progress_for_other_file_is_ignored(self):
+        with open(self.path, "wb") as f:
+            f.write(b"\0" * len(PAYLOAD))
+        with open(self.progress, "w", encoding="utf-8") as f:
+            json.dump({"size": len(PAYLOAD), "etag": '"other"', "ranges": [[0, len(PAYLOAD) - 1, len(PAYLOAD)]]}, f)
+
+        info = worker.download_ranged(self.url, self.path, {}, connections=4)
+
+        self.assertIsNotNone(info)
+        self.assertEqual(self.server.served, len(PAYLOAD))
+        self.assertEqual(self.read(), PAYLOAD)
+
+
+if __name__ == "__main__":
+    unittest.main()
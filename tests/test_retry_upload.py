@@ -0,0 +1,98 @@
+# Test retry job upload yang gagal: sweep gagal worker tidak boleh menghapus file upload (main.retry_job butuh file itu)
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+import main
+import worker
+
+
+class FakePopen:
+    """Pengganti subprocess.Popen worker: catat command, langsung dianggap sudah exit"""
+    commands = []
+
+    def __init__(self, cmd, **kwargs):
+        FakePopen.commands.append(cmd)
+
+    def poll(self):
+        return 0
+
+
+class RetryUploadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.saved = {name: getattr(worker, name) for name in ("JOB_DIR", "src", "is_url", "ARTIFACTS")}
+        FakePopen.commands = []
+        patches = [
+            mock.patch.object(main, "DATA_DIR", self.tmp),
+            mock.patch.object(main.subprocess, "Popen", FakePopen),
+            mock.patch.dict(main.WORKERS, clear=True),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.client = TestClient(main.app)
+
+    def tearDown(self):
+        for name, value in self.saved.items():
+            setattr(worker, name, value)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def fail_job(self, job_id, upload_path):
+        """Jalankan bagian worker yang relevan: upload dipakai sebagai artifact, job gagal, sweep"""
+        job_dir = os.path.join(self.tmp, job_id)
+        worker.JOB_DIR, worker.src, worker.is_url, worker.ARTIFACTS = job_dir, upload_path, False, {}
+        audio_path = os.path.join(job_dir, "audio.wav")
+        with open(audio_path, "wb") as f:
+            f.write(b"\0" * 1024)
+        with open(os.path.join(job_dir, "output.mp4"), "wb") as f:
+            f.write(b"partial")
+        worker.track_artifact(upload_path, "audio", "burn")
+        worker.track_artifact(audio_path, "transcribe")
+
+        worker.sweep_partials(failed=True)
+        main.update_status(job_id, "failed", "Burn failed")
+        return job_dir
+
+    def test_retry_failed_upload(self):
+        # Nama upload sengaja cocok dengan pola partial download (video_*.mp4)
+        response = self.client.post("/api/upload", files={"file": ("video_1.mp4", b"\1" * 4096)}, data={"target": "id"})
+        self.assertEqual(response.status_code, 200)
+        job_id = response.json()["job_id"]
+        upload_path = FakePopen.commands[0][3]
+
+        job_dir = self.fail_job(job_id, upload_path)
+
+        self.assertTrue(os.path.exists(upload_path))
+        self.assertFalse(os.path.exists(os.path.join(job_dir, "audio.wav")))
+        self.assertFalse(os.path.exists(os.path.join(job_dir, "output.mp4")))
+
+        response = self.client.post(f"/api/jobs/{job_id}/retry")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["retried"])
+        self.assertEqual(FakePopen.commands[1][3], upload_path)
+        self.assertEqual(main.job_status(job_id), "queued")
+
+    def test_retry_without_upload_is_rejected(self):
+        response = self.client.post("/api/upload", files={"file": ("clip.mp4", b"\1" * 4096)})
+        job_id = response.json()["job_id"]
+        upload_path = FakePopen.commands[0][3]
+        self.fail_job(job_id, upload_path)
+        os.remove(upload_path)
+
+        response = self.client.post(f"/api/jobs/{job_id}/retry")
+
+        self.assertEqual(response.status_code, 409)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,46 +7,50 @@ import re
 import time
 import glob
 import logging
-import requests
 import random
-import tempfile
-from http.cookies import SimpleCookie
-from bs4 import BeautifulSoup
+import threading
+import resource
+from array import array
+from contextlib import contextmanager
 from urllib.parse import urlparse, urljoin
-import pysubs2
+from presets import (
+    WHISPER_PRESETS, DEFAULT_PRESET, ENCODING_PROFILES, DEFAULT_ENCODING_PROFILE, X264_PRESET_SPEED, BURN_MODES,
+    X264_THREAD_SCALING, X264_SLOWEST_AUTO_PRESET,
+)
+import download_cache
 
 # ======================================
-# Arguments
+# Job (diisi oleh setup_job — import modul ini tanpa side effect)
 # ======================================
-job_id = sys.argv[1]
-src = sys.argv[2]
-target = sys.argv[3]
-is_url = bool(int(sys.argv[4]))
-font_size = sys.argv[5]
+job_id = None
+src = None
+target = "id"
+is_url = False
+font_size = "24"
 
 APP_DIR = os.path.dirname(__file__)
-JOB_DIR = os.path.join(APP_DIR, "output", job_id)
-STATUS = os.path.join(JOB_DIR, "status.json")
-LOG_FILE = os.path.join(JOB_DIR, "worker.log")
-COOKIES_TEMP = os.path.join(JOB_DIR, "cookies_temp.txt")
-os.makedirs(JOB_DIR, exist_ok=True)
-
-# ======================================
-# Logging
-# ======================================
-logging.basicConfig(
-    level=logging.INFO,
-    format='[%(asctime)s] %(levelname)s: %(message)s',
-    datefmt='%H:%M:%S',
-    handlers=[
-        logging.FileHandler(LOG_FILE, encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+JOB_DIR = None
+STATUS = None
+LOG_FILE = None
+COOKIES_TEMP = None
+OPTIONS_FILE = None
+PROFILE = None
+
+# Opsi per job (ditulis main.py), misalnya {"preset": "fast"}
+OPTIONS = {}
 
 logger = logging.getLogger(__name__)
 FFMPEG = os.environ.get("FFMPEG", "ffmpeg")
 
+# Audio di-decode langsung ke memory; audio.wav hanya ditulis kalau DEBUG_AUDIO=1
+SAMPLE_RATE = 16000
+DEBUG_AUDIO = os.environ.get("DEBUG_AUDIO", "0") == "1"
+
+# Job "subtitles" hanya butuh file subtitle → cukup ambil audio, tanpa download/burn video
+SUBTITLES_ONLY = False
+# Job "hls" → playlist + segment yang bisa diputar selama burn masih jalan
+HLS_OUTPUT = False
+
 # ======================================
 # COOKIES FROM SECRET - DIPERBAIKI
 # ======================================
@@ -87,24 +91,396 @@ def setup_cookies():
         logger.error(f"Error verifying cookies: {e}")
         return None
 
-COOKIES_PATH = setup_cookies()
+COOKIES_PATH = None
 
 # ======================================
 # Helper Functions
 # ======================================
+# Metadata job yang dibawa antar stage (bahasa terdeteksi, dll) — ikut ditulis ke status.json
+JOB_META = {}
+
+# Status bisa ditulis dari beberapa thread (mis. render preview)
+_status_lock = threading.Lock()
+_last_status = ("started", "")
+
 def update(status, log_msg=""):
     """Update status job"""
-    data = {"status": status, "log": log_msg}
-    if status == "done":
-        data["output"] = f"/api/output/{job_id}"
+    global _last_status
+    with _status_lock:
+        _last_status = (status, log_msg)
+        data = {"status": status, "log": log_msg}
+        if status == "done":
+            data["output"] = f"/api/output/{job_id}"
+        if JOB_META:
+            data["meta"] = JOB_META
+        try:
+            tmp = STATUS + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, STATUS)
+        except Exception as e:
+            logger.error(f"Status write error: {e}")
+
+def refresh_status():
+    """Tulis ulang status terakhir (dipakai setelah JOB_META berubah)"""
+    update(*_last_status)
+
+_profile_lock = threading.Lock()
+
+def record_profile(section, data):
+    """Simpan metrik performa job ke profile.json (per section)"""
+    with _profile_lock:
+        try:
+            profile = {}
+            if os.path.exists(PROFILE):
+                with open(PROFILE, "r", encoding="utf-8") as f:
+                    profile = json.load(f)
+            profile[section] = data
+            tmp = PROFILE + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(profile, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, PROFILE)
+        except Exception as e:
+            logger.error(f"Profile write error: {e}")
+
+def find_video_file(job_dir):
+    """Cari file video di directory job"""
+    video_extensions = ['.mp4', '.mkv', '.webm', '.flv', '.avi', '.mov', '.wmv']
+    
+    for ext in video_extensions:
+        for f in glob.glob(os.path.join(job_dir, f"*{ext}")):
+            if any(x in f.lower() for x in ['.part', '.temp', '.ytdl', '.frag', '.tmp']):
+                continue
+            if os.path.getsize(f) > 1_000_000:  # > 1MB
+                logger.info(f"Found video file: {f} ({os.path.getsize(f)/1024/1024:.2f} MB)")
+                return f
+    
+    return None
+
+# ======================================
+# RESOURCE ACCOUNTING - CPU, peak RSS, I/O per stage & per job
+# ======================================
+# Statistik per stage (ditulis ke profile.json section "stages")
+STAGE_STATS = {}
+
+def read_proc_io(pid="self"):
+    """read_bytes/write_bytes (storage) dari /proc/<pid>/io; {} kalau tidak tersedia"""
     try:
-        with open(STATUS, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        logger.error(f"Status write error: {e}")
+        with open(f"/proc/{pid}/io", "r") as f:
+            fields = dict(line.split(": ", 1) for line in f.read().splitlines() if ": " in line)
+        return {"read_bytes": int(fields["read_bytes"]), "write_bytes": int(fields["write_bytes"])}
+    except (OSError, KeyError, ValueError):
+        return {}
+
+# Peak RSS (KB) anak yang sudah selesai: wait4 per command + worker pool Whisper (VmHWM sebelum shutdown)
+CHILD_PEAKS = []
+
+def read_peak_rss(pid="self"):
+    """VmHWM (KB) dari /proc/<pid>/status; 0 kalau tidak tersedia"""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+def reset_peak_rss():
+    """Reset VmHWM proses ini ke RSS sekarang (clear_refs 5); False kalau kernel tidak mengizinkan"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+# CPU & I/O worker pool Whisper: worker forkserver adalah anak proses forkserver, bukan anak kita,
+# jadi tidak pernah masuk RUSAGE_CHILDREN maupun /proc/self/io → dibaca dari /proc sebelum shutdown
+POOL_USAGE = {"cpu": 0.0, "read_bytes": 0, "write_bytes": 0}
+
+def read_proc_cpu(pid="self"):
+    """utime + stime (detik) dari /proc/<pid>/stat; 0.0 kalau tidak tersedia"""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            # Nama proses (field 2) bisa berisi spasi → parse setelah ')' terakhir; utime/stime = field 14/15
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+def record_pool_usage(pool):
+    """Catat VmHWM, CPU & I/O tiap worker process pool (dipanggil sebelum shutdown, selagi proses masih ada)"""
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        peak = read_peak_rss(process.pid)
+        if peak:
+            CHILD_PEAKS.append(peak)
+        POOL_USAGE["cpu"] += read_proc_cpu(process.pid)
+        for key, value in read_proc_io(process.pid).items():
+            POOL_USAGE[key] += value
+
+def usage_snapshot():
+    """
+    CPU & max RSS proses ini + anak yang sudah di-reap (+ worker pool Whisper), plus I/O.
+    /proc/self/io ikut menjumlahkan I/O anak yang sudah di-reap (kernel menambahkannya saat wait).
+    """
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    io = read_proc_io()
+    for key in io:
+        io[key] += POOL_USAGE[key]
+    return {
+        "time": time.time(),
+        "self_cpu": own.ru_utime + own.ru_stime,
+        "children_cpu": children.ru_utime + children.ru_stime + POOL_USAGE["cpu"],
+        # ru_maxrss dalam KB; RUSAGE_CHILDREN = anak terbesar
+        "peak_rss_kb": max(own.ru_maxrss, children.ru_maxrss),
+        **io,
+    }
+
+def usage_delta(before, after, peak_rss_kb=None):
+    """
+    Selisih dua snapshot dalam bentuk yang disimpan ke profile.
+    peak_rss_kb: peak terukur untuk interval ini; tanpa itu dipakai high-water mark seumur proses (level job).
+    """
+    delta = {
+        "wall_seconds": round(after["time"] - before["time"], 2),
+        "cpu_seconds": round(after["self_cpu"] - before["self_cpu"] + after["children_cpu"] - before["children_cpu"], 2),
+        "children_cpu_seconds": round(after["children_cpu"] - before["children_cpu"], 2),
+        "peak_rss_mb": round((peak_rss_kb if peak_rss_kb is not None else after["peak_rss_kb"]) / 1024, 1),
+    }
+    for key in ("read_bytes", "write_bytes"):
+        if key in before and key in after:
+            delta[key] = after[key] - before[key]
+    return delta
+
+# Snapshot awal job (diisi setup_job)
+JOB_USAGE_START = None
+
+@contextmanager
+def stage(name):
+    """
+    Catat resource yang dipakai satu stage pipeline (juga kalau stage gagal / sys.exit).
+    Peak RSS stage = max(VmHWM proses ini sejak di-reset di awal stage, peak anak yang selesai di stage ini);
+    ru_maxrss tidak dipakai di sini karena itu high-water mark seumur proses.
+    """
+    exact = reset_peak_rss()
+    mark = len(CHILD_PEAKS)
+    before = usage_snapshot()
+    try:
+        yield
+    finally:
+        after = usage_snapshot()
+        peak = max([read_peak_rss()] + CHILD_PEAKS[mark:])
+        STAGE_STATS[name] = usage_delta(before, after, peak_rss_kb=peak)
+        if not exact:
+            STAGE_STATS[name]["peak_rss_lifetime"] = True
+        release_artifacts(name)
+        record_profile("stages", STAGE_STATS)
+        if JOB_USAGE_START:
+            record_profile("resources", usage_delta(JOB_USAGE_START, after))
+        stats = STAGE_STATS[name]
+        logger.info(f"Stage {name}: cpu {stats['cpu_seconds']}s, wall {stats['wall_seconds']}s, peak RSS {stats['peak_rss_mb']} MB")
+
+# ======================================
+# ARTIFACTS - intermediate file dihapus begitu consumer terakhirnya selesai
+# ======================================
+# KEEP_ARTIFACTS=1 → semua intermediate dibiarkan (untuk debugging)
+KEEP_ARTIFACTS = os.environ.get("KEEP_ARTIFACTS", "0") == "1"
+
+# path → set nama stage yang masih butuh file itu
+ARTIFACTS = {}
+_artifacts_lock = threading.Lock()
+
+# Sisa yang tidak pernah jadi input stage lain (percobaan download gagal, dump debug, dll)
+PARTIAL_PATTERNS = [
+    "video_*.mp4", "video_ytdlp.mp4*", "*.progress.json", "*.part", "*.ytdl",
+    "*.tmp.mp4", "audio_ytdlp.*", "debug_*.html", "cookies_temp.txt", "burn_parts",
+]
+# Tambahan untuk job gagal / dibatalkan: output setengah jadi
+FAILED_PATTERNS = ["output.mp4", "output.srt", "preview.mp4", "hls"]
+# Download ranged yang belum selesai (<file>.progress.json + <file>) tetap ada di job gagal / dibatalkan
+# supaya retry bisa resume; baru dihapus saat job sukses atau job dihapus
+RESUME_SUFFIX = ".progress.json"
+
+def _remove(path):
+    """Hapus file/directory; return jumlah byte yang dibebaskan"""
+    import shutil
+    
+    try:
+        if os.path.isdir(path):
+            size = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+            shutil.rmtree(path, ignore_errors=True)
+            return size
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except OSError:
+        return 0
+
+def track_artifact(path, *consumers):
+    """Daftarkan intermediate beserta stage yang masih membacanya (hanya file di dalam JOB_DIR)"""
+    if not path:
+        return
+    # Input di luar job (file upload lain, media benchmark, dll) bukan milik job → tidak pernah dihapus
+    job_dir = os.path.realpath(JOB_DIR)
+    if os.path.commonpath([job_dir, os.path.realpath(path)]) != job_dir:
+        return
+    with _artifacts_lock:
+        ARTIFACTS.setdefault(path, set()).update(consumers)
+
+def release_artifacts(stage_name):
+    """Stage selesai → hapus artifact yang tidak punya consumer lagi"""
+    with _artifacts_lock:
+        done = []
+        for path, consumers in ARTIFACTS.items():
+            consumers.discard(stage_name)
+            if not consumers:
+                done.append(path)
+        for path in done:
+            del ARTIFACTS[path]
+    if KEEP_ARTIFACTS:
+        return
+    for path in done:
+        freed = _remove(path)
+        if freed:
+            logger.info(f"Removed {os.path.basename(path)} after '{stage_name}' ({freed / 1024 / 1024:.1f} MB)")
+
+def sweep_partials(failed=False):
+    """
+    Bersihkan sisa di directory job; job gagal juga kehilangan artifact yang masih terdaftar & output parsial,
+    kecuali download ranged yang bisa di-resume (lihat RESUME_SUFFIX) dan file upload (input job, dipakai retry).
+    """
+    if KEEP_ARTIFACTS:
+        return
+    patterns = PARTIAL_PATTERNS + (FAILED_PATTERNS if failed else [])
+    paths = {path for pattern in patterns for path in glob.glob(os.path.join(JOB_DIR, pattern))}
+    if failed:
+        with _artifacts_lock:
+            paths.update(ARTIFACTS)
+            ARTIFACTS.clear()
+        progress = glob.glob(os.path.join(JOB_DIR, "*" + RESUME_SUFFIX))
+        paths -= set(progress) | {path[:-len(RESUME_SUFFIX)] for path in progress}
+    if not is_url and src:
+        # Nama upload bisa cocok dengan pola partial (mis. video_1.mp4) → bandingkan path aslinya
+        source = os.path.realpath(src)
+        paths = {path for path in paths if os.path.realpath(path) != source}
+    freed = sum(_remove(path) for path in paths)
+    if freed:
+        logger.info(f"Swept {len(paths)} leftover file(s) ({freed / 1024 / 1024:.1f} MB)")
+
+# ======================================
+# PROCESS RUNNER - streaming output, progress, process group
+# ======================================
+OUTPUT_TAIL_LINES = 200   # ring buffer per stream (memori tetap kecil untuk output panjang)
+
+# Proses anak yang sedang jalan (di-kill satu group saat timeout / cancel)
+_running = set()
+_running_lock = threading.Lock()
+CANCEL = threading.Event()
+
+# Statistik per command (CPU time & max RSS dari wait4)
+COMMAND_STATS = []
+
+FFMPEG_TIME_RE = re.compile(r"time=(\d+):(\d+):(\d+(?:\.\d+)?)")
+PERCENT_RE = re.compile(r"(\d{1,3}(?:\.\d+)?)%")
+YTDLP_RE = re.compile(r"\[download\]\s+(\d{1,3}(?:\.\d+)?)%(?:.*?at\s+(\S+))?")
+
+def parse_progress(line):
+    """Ubah satu baris output ffmpeg / curl / yt-dlp jadi event progress (dict) atau None"""
+    # ffmpeg -progress: key=value per baris
+    if line.startswith("out_time_us=") or line.startswith("out_time_ms="):
+        try:
+            return {"source": "ffmpeg", "time": int(line.split("=", 1)[1]) / 1_000_000}
+        except ValueError:
+            return None
+    # ffmpeg stats di stderr: "frame= 100 fps= 25 ... time=00:00:04.00 ... speed=1.0x"
+    match = FFMPEG_TIME_RE.search(line)
+    if match and ("frame=" in line or "size=" in line):
+        h, m, sec = match.groups()
+        return {"source": "ffmpeg", "time": int(h) * 3600 + int(m) * 60 + float(sec)}
+    match = YTDLP_RE.search(line)
+    if match:
+        event = {"source": "yt-dlp", "percent": float(match.group(1))}
+        if match.group(2):
+            event["speed"] = match.group(2)
+        return event
+    # curl --progress-bar: "######   42.0%"
+    if line.lstrip().startswith("#"):
+        match = PERCENT_RE.search(line)
+        if match:
+            return {"source": "curl", "percent": float(match.group(1))}
+    return None
+
+_last_progress_write = 0.0
+
+def publish_progress(event):
+    """Default handler: event progress terbaru masuk ke metadata status (maks 1x per detik)"""
+    global _last_progress_write
+    JOB_META["progress"] = event
+    now = time.time()
+    if now - _last_progress_write >= 1.0:
+        _last_progress_write = now
+        refresh_status()
+
+def _pump(stream, tail, on_progress):
+    """Baca output incremental (pisah di \\r dan \\n), simpan di ring buffer, parse progress"""
+    pending = b""
+    while True:
+        data = stream.read1(65536) if hasattr(stream, "read1") else stream.read(65536)
+        if not data:
+            break
+        pending += data
+        parts = re.split(rb"[\r\n]", pending)
+        pending = parts.pop()
+        for raw in parts:
+            line = raw.decode("utf-8", errors="ignore").strip()
+            if not line:
+                continue
+            tail.append(line)
+            event = parse_progress(line)
+            if event is not None and on_progress is not None:
+                try:
+                    on_progress(event)
+                except Exception:
+                    pass
+    if pending.strip():
+        tail.append(pending.decode("utf-8", errors="ignore").strip())
+
+def _kill_group(process, grace=5.0):
+    """SIGTERM ke seluruh process group, SIGKILL kalau tidak mati dalam `grace` detik"""
+    import signal
+    
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(process.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            return
+        deadline = time.time() + grace
+        while time.time() < deadline:
+            if process.poll() is not None:
+                return
+            time.sleep(0.1)
 
-def run_command(cmd, timeout=300):
-    """Run shell command dengan logging yang baik"""
+def kill_running():
+    """Kill semua process group anak yang masih jalan (dipakai saat job di-cancel)"""
+    CANCEL.set()
+    with _running_lock:
+        processes = list(_running)
+    for process in processes:
+        _kill_group(process, grace=2.0)
+
+def start_command(cmd, nice=0, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE):
+    """
+    Spawn command di process group sendiri dan daftarkan ke _running (ikut di-kill saat cancel).
+    Return Popen (dengan atribut label & started) atau None kalau gagal / job sudah di-cancel.
+    """
+    name = os.path.basename(cmd[0] if isinstance(cmd, list) else cmd.split()[0])
+    
+    # Pakai coreutils `nice` (preexec_fn tidak aman dipakai dari thread)
+    if nice:
+        cmd = ["nice", "-n", str(nice)] + cmd if isinstance(cmd, list) else f"nice -n {nice} {cmd}"
+    
     if isinstance(cmd, list):
         cmd_str = " ".join(cmd)
     else:
@@ -112,58 +488,375 @@ def run_command(cmd, timeout=300):
     
     logger.info(f"RUN → {cmd_str[:200]}...")
     
+    if CANCEL.is_set():
+        logger.error("Job cancelled, command not started")
+        return None
+    
     try:
-        process = subprocess.run(
+        process = subprocess.Popen(
             cmd,
             shell=isinstance(cmd, str),
-            capture_output=True,
-            text=True,
+            stdin=stdin,
+            stdout=stdout,
+            stderr=stderr,
             cwd=APP_DIR,
-            timeout=timeout,
-            encoding='utf-8',
-            errors='ignore'
+            start_new_session=True,   # process group sendiri → bisa kill cucu juga
         )
-        
-        if process.stdout:
-            output = process.stdout.strip()
-            if output:
-                logger.info(f"STDOUT: {output[-500:]}")
-        
-        if process.stderr:
-            error = process.stderr.strip()
-            if error:
-                logger.error(f"STDERR: {error[-500:]}")
-        
-        logger.info(f"Exit code: {process.returncode}")
-        return process.returncode
-        
-    except subprocess.TimeoutExpired:
-        logger.error(f"Command timeout after {timeout}s")
-        return -1
     except Exception as e:
         logger.error(f"Command error: {e}")
+        return None
+    
+    process.label = name
+    process.started = time.time()
+    process.nice = nice
+    with _running_lock:
+        _running.add(process)
+    return process
+
+def wait_command(process, timeout):
+    """
+    Tunggu proses dari start_command lewat wait4: timeout/cancel → kill seluruh process group.
+    CPU time & max RSS dari wait4, I/O dari sampel terakhir /proc/<pid>/io; dicatat ke COMMAND_STATS.
+    Return exit code (-1 kalau di-kill).
+    """
+    rusage = None
+    io = {}
+    returncode = -1
+    try:
+        while True:
+            io = read_proc_io(process.pid) or io
+            pid, wait_status, rusage = os.wait4(process.pid, os.WNOHANG)
+            if pid:
+                returncode = os.waitstatus_to_exitcode(wait_status)
+                process.returncode = returncode
+                break
+            if time.time() - process.started > timeout:
+                logger.error(f"Command timeout after {timeout}s, killing process group")
+                _kill_group(process)
+                break
+            if CANCEL.is_set():
+                logger.error("Job cancelled, killing process group")
+                _kill_group(process, grace=2.0)
+                break
+            time.sleep(0.2)
+    except ChildProcessError:
+        # Sudah di-reap oleh _kill_group (poll)
+        returncode = process.returncode if process.returncode is not None else -1
+    finally:
+        with _running_lock:
+            _running.discard(process)
+    
+    elapsed = time.time() - process.started
+    stats = {
+        "command": process.label,
+        "exit_code": returncode,
+        "wall_seconds": round(elapsed, 2),
+    }
+    if rusage is not None:
+        stats["cpu_seconds"] = round(rusage.ru_utime + rusage.ru_stime, 2)
+        stats["max_rss_mb"] = round(rusage.ru_maxrss / 1024, 1)
+        CHILD_PEAKS.append(rusage.ru_maxrss)
+        logger.info(f"Exit code: {returncode} (wall {elapsed:.1f}s, cpu {stats['cpu_seconds']}s, max RSS {stats['max_rss_mb']} MB)")
+    else:
+        logger.info(f"Exit code: {returncode}")
+    stats.update(io)
+    COMMAND_STATS.append(stats)
+    record_profile("commands", COMMAND_STATS)
+    return returncode
+
+def run_command(cmd, timeout=300, nice=0, on_progress=publish_progress):
+    """
+    Run shell command dengan logging yang baik (nice > 0 = prioritas CPU lebih rendah).
+    Output dibaca incremental ke ring buffer, progress di-parse, dan saat timeout/cancel
+    seluruh process group di-kill (lihat wait_command).
+    """
+    from collections import deque
+    
+    process = start_command(cmd, nice=nice)
+    if process is None:
         return -1
+    
+    stdout_tail = deque(maxlen=OUTPUT_TAIL_LINES)
+    stderr_tail = deque(maxlen=OUTPUT_TAIL_LINES)
+    readers = [
+        threading.Thread(target=_pump, args=(process.stdout, stdout_tail, on_progress), daemon=True),
+        threading.Thread(target=_pump, args=(process.stderr, stderr_tail, on_progress), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+    
+    returncode = wait_command(process, timeout)
+    
+    for reader in readers:
+        reader.join(timeout=5)
+    
+    JOB_META.pop("progress", None)
+    
+    output = "\n".join(stdout_tail)
+    if output:
+        logger.info(f"STDOUT: {output[-500:]}")
+    error = "\n".join(stderr_tail)
+    if error:
+        logger.error(f"STDERR: {error[-500:]}")
+    
+    return returncode
 
-def find_video_file(job_dir):
-    """Cari file video di directory job"""
-    video_extensions = ['.mp4', '.mkv', '.webm', '.flv', '.avi', '.mov', '.wmv']
+def capture_command(cmd, timeout=60):
+    """
+    Seperti run_command, tapi stdout dikumpulkan utuh (ffprobe JSON, PCM, SRT).
+    Return (exit code, stdout bytes, stderr ring buffer sebagai str).
+    """
+    from collections import deque
     
-    for ext in video_extensions:
-        for f in glob.glob(os.path.join(job_dir, f"*{ext}")):
-            if any(x in f.lower() for x in ['.part', '.temp', '.ytdl', '.frag', '.tmp']):
-                continue
-            if os.path.getsize(f) > 1_000_000:  # > 1MB
-                logger.info(f"Found video file: {f} ({os.path.getsize(f)/1024/1024:.2f} MB)")
-                return f
+    process = start_command(cmd)
+    if process is None:
+        return -1, b"", ""
+    
+    stdout = bytearray()
+    stderr_tail = deque(maxlen=OUTPUT_TAIL_LINES)
+    
+    def collect():
+        for data in iter(lambda: process.stdout.read(1 << 16), b""):
+            stdout.extend(data)
+    
+    readers = [
+        threading.Thread(target=collect, daemon=True),
+        threading.Thread(target=_pump, args=(process.stderr, stderr_tail, None), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+    
+    returncode = wait_command(process, timeout)
+    
+    for reader in readers:
+        reader.join(timeout=5)
+    return returncode, stdout, "\n".join(stderr_tail)
+
+# ======================================
+# RANGED DOWNLOADER - paralel + resume
+# ======================================
+DOWNLOAD_CONNECTIONS = max(1, int(os.environ.get("DOWNLOAD_CONNECTIONS", "4")))
+DOWNLOAD_MIN_RANGE = 8 * 1024 * 1024   # range lebih kecil dari ini tidak worth dipecah
+DOWNLOAD_SINK_BLOCK = 4 * 1024 * 1024  # ukuran blok berurutan kalau ada progressive sink
+DOWNLOAD_RETRIES = 5                   # percobaan per range
+DOWNLOAD_RETRY_DELAY = 2.0             # backoff linear antar percobaan (detik)
+
+DOWNLOAD_CACHE = os.environ.get("DOWNLOAD_CACHE", "1") == "1"
+
+# Info download terakhir yang sukses (direct URL, ETag, dll) — untuk download cache
+DOWNLOAD_INFO = {}
+
+def probe_ranges(url, headers):
+    """
+    Cek dukungan Range + ukuran file.
+    Return dict {url, size, etag, last_modified} atau None kalau server tidak support range.
+    """
+    import requests
     
+    try:
+        r = requests.head(url, headers=headers, allow_redirects=True, timeout=30)
+        size = int(r.headers.get("Content-Length", 0))
+        if r.status_code == 200 and size > 0 and r.headers.get("Accept-Ranges", "").lower() == "bytes":
+            return {
+                "url": r.url,
+                "size": size,
+                "etag": r.headers.get("ETag"),
+                "last_modified": r.headers.get("Last-Modified"),
+            }
+        
+        # Sebagian CDN tidak jawab HEAD dengan benar → coba GET 1 byte
+        r = requests.get(url, headers=dict(headers, Range="bytes=0-0"), allow_redirects=True, timeout=30, stream=True)
+        r.close()
+        content_range = r.headers.get("Content-Range", "")
+        if r.status_code == 206 and "/" in content_range and not content_range.endswith("/*"):
+            return {
+                "url": r.url,
+                "size": int(content_range.rsplit("/", 1)[1]),
+                "etag": r.headers.get("ETag"),
+                "last_modified": r.headers.get("Last-Modified"),
+            }
+    except Exception as e:
+        logger.warning(f"Range probe failed: {e}")
+    return None
+
+def _load_progress(progress_path, meta):
+    """Progress map dari run sebelumnya (hanya kalau file yang sama: size + ETag cocok)"""
+    try:
+        with open(progress_path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("size") == meta["size"] and saved.get("etag") == meta["etag"]:
+            return saved["ranges"]
+    except (OSError, ValueError, KeyError):
+        pass
     return None
 
+def download_ranged(url, path, headers, connections=DOWNLOAD_CONNECTIONS, sink=None):
+    """
+    Download dengan N koneksi Range paralel ke file yang sudah dialokasikan.
+    Tanpa sink file dibagi jadi N range besar; dengan sink dibagi jadi blok kecil yang diambil
+    koneksi secara berurutan dari antrian bersama, supaya awal file selesai duluan dan sink
+    (decode) bisa jalan sambil download.
+    Progress disimpan di <path>.progress.json sehingga worker yang restart bisa lanjut.
+    Return info dict (url, size, etag, last_modified, seconds, bytes_per_second) atau None.
+    """
+    import requests
+    
+    meta = probe_ranges(url, headers)
+    if meta is None:
+        logger.info("Server tidak support Range, pakai single download")
+        return None
+    
+    total = meta["size"]
+    progress_path = path + ".progress.json"
+    ranges = _load_progress(progress_path, meta) if os.path.exists(path) else None
+    
+    if ranges:
+        done_bytes = sum(r[2] for r in ranges)
+        logger.info(f"Resuming download: {done_bytes / 1024 / 1024:.1f} / {total / 1024 / 1024:.1f} MB already on disk")
+        fd = os.open(path, os.O_RDWR)
+    else:
+        if sink is not None:
+            step = DOWNLOAD_SINK_BLOCK
+            count = max(1, -(-total // step))
+        else:
+            count = max(1, min(connections, total // DOWNLOAD_MIN_RANGE))
+            step = total // count
+        ranges = [[i * step, min((i + 1) * step, total) - 1 if i < count - 1 else total - 1, 0] for i in range(count)]
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.posix_fallocate(fd, 0, total)
+        except (AttributeError, OSError):
+            os.ftruncate(fd, total)
+    
+    lock = threading.Lock()
+    failed = []
+    pending = iter(range(len(ranges)))   # antrian bersama, urut posisi di file
+    
+    def save_progress():
+        with lock:
+            state = dict(meta, ranges=[list(r) for r in ranges])
+        tmp = progress_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, progress_path)
+    
+    def fetch(session, index):
+        r_range = ranges[index]
+        for attempt in range(1, DOWNLOAD_RETRIES + 1):
+            start = r_range[0] + r_range[2]
+            if start > r_range[1]:
+                return
+            try:
+                resp = session.get(
+                    meta["url"],
+                    headers=dict(headers, Range=f"bytes={start}-{r_range[1]}"),
+                    stream=True, timeout=60
+                )
+                if resp.status_code != 206:
+                    raise IOError(f"HTTP {resp.status_code} for range {start}-{r_range[1]}")
+                offset = start
+                for chunk in resp.iter_content(1 << 16):
+                    if not chunk:
+                        continue
+                    chunk = chunk[:r_range[1] + 1 - offset]
+                    os.pwrite(fd, chunk, offset)
+                    offset += len(chunk)
+                    with lock:
+                        r_range[2] = offset - r_range[0]
+                    if offset > r_range[1]:
+                        break
+                resp.close()
+            except Exception as e:
+                logger.warning(f"Range {index} attempt {attempt} error: {e}")
+                time.sleep(DOWNLOAD_RETRY_DELAY * attempt)
+        if r_range[0] + r_range[2] <= r_range[1]:
+            failed.append(index)
+    
+    def connection():
+        """Satu koneksi: ambil range/blok berikutnya dari antrian sampai habis"""
+        with requests.Session() as session:
+            while True:
+                with lock:
+                    index = next(pending, None)
+                if index is None:
+                    return
+                fetch(session, index)
+    
+    def frontier():
+        """Byte kontigu dari awal file yang sudah selesai (untuk progressive sink)"""
+        end = 0
+        with lock:
+            for start, stop, done in ranges:
+                end = start + done
+                if done < stop - start + 1:
+                    break
+        return end
+    
+    started = time.time()
+    initial = sum(r[2] for r in ranges)
+    fed = 0
+    count = max(1, min(connections, len(ranges)))
+    threads = [threading.Thread(target=connection, daemon=True) for _ in range(count)]
+    for t in threads:
+        t.start()
+    logger.info(f"Ranged download: {total / 1024 / 1024:.1f} MB in {len(ranges)} range(s) with {count} connection(s)")
+    
+    try:
+        while any(t.is_alive() for t in threads):
+            time.sleep(1)
+            save_progress()
+            with lock:
+                done_bytes = sum(r[2] for r in ranges)
+            rate = (done_bytes - initial) / max(time.time() - started, 1e-6)
+            JOB_META["download_bytes_per_second"] = int(rate)
+            update("downloading", f"Downloading {done_bytes * 100 / total:.0f}% ({rate / 1024 / 1024:.1f} MB/s)")
+            
+            if sink is not None:
+                edge = frontier()
+                while fed < edge:
+                    data = os.pread(fd, min(1 << 20, edge - fed), fed)
+                    sink.feed(data)
+                    fed += len(data)
+        
+        save_progress()
+        if failed:
+            logger.error(f"Ranged download incomplete: range(s) {failed} failed")
+            return None
+        
+        if sink is not None:
+            while fed < total:
+                data = os.pread(fd, min(1 << 20, total - fed), fed)
+                sink.feed(data)
+                fed += len(data)
+    finally:
+        os.close(fd)
+    
+    # File sudah dialokasikan penuh sejak awal → yang diverifikasi byte yang benar-benar ditulis per range
+    written = sum(min(done, stop - start + 1) for start, stop, done in ranges)
+    if written != total or any(start + done <= stop for start, stop, done in ranges):
+        logger.error(f"Size mismatch after download: {written} of {total} bytes written")
+        return None
+    
+    os.remove(progress_path)
+    elapsed = time.time() - started
+    info = dict(
+        meta,
+        seconds=round(elapsed, 2),
+        bytes_per_second=int((total - initial) / max(elapsed, 1e-6)),
+        connections=count,
+    )
+    logger.info(f"✓ Ranged download done: {total / 1024 / 1024:.1f} MB in {elapsed:.1f}s ({info['bytes_per_second'] / 1024 / 1024:.1f} MB/s)")
+    return info
+
 # ======================================
 # EPORNER SCRAPER - METODE 1: Direct MP4
 # ======================================
-def scrape_eporner_direct(url):
-    """Cari URL MP4 langsung di halaman"""
-    logger.info("Trying direct MP4 scraping...")
+def iter_direct_urls(url):
+    """
+    Scrape halaman dengan beberapa User-Agent; yield (idx, ua, best_url) untuk tiap attempt
+    yang menemukan URL MP4. Attempt berikutnya hanya jalan kalau pemanggil lanjut iterasi.
+    """
+    import requests
     
     user_agents = [
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36",
@@ -236,6 +929,7 @@ def scrape_eporner_direct(url):
             debug_file = os.path.join(JOB_DIR, f"debug_{idx}.html")
             with open(debug_file, "w", encoding="utf-8") as f:
                 f.write(html[:50000])
+            track_artifact(debug_file, "download")
             
             # Regex patterns untuk mencari URL video
             patterns = [
@@ -347,6 +1041,21 @@ def scrape_eporner_direct(url):
             
             logger.info(f"Selected URL: {best_url[:200]}...")
             
+            yield idx, ua, best_url
+                
+        except Exception as e:
+            logger.error(f"Error in attempt {idx}: {e}")
+            continue
+        
+        time.sleep(2)
+
+def scrape_eporner_direct(url):
+    """Cari URL MP4 langsung di halaman"""
+    global STREAMED, DOWNLOAD_INFO
+    logger.info("Trying direct MP4 scraping...")
+    
+    for idx, ua, best_url in iter_direct_urls(url):
+        try:
             # Download video
             video_path = os.path.join(JOB_DIR, f"video_{idx}.mp4")
             
@@ -365,7 +1074,6 @@ def scrape_eporner_direct(url):
                 '-H', 'Accept: */*',
                 '-H', 'Accept-Language: en-US,en;q=0.9',
                 '-H', 'Origin: https://www.eporner.com',
-                '-o', video_path,
                 best_url
             ]
             
@@ -373,23 +1081,65 @@ def scrape_eporner_direct(url):
             if COOKIES_PATH and os.path.exists(COOKIES_PATH):
                 curl_cmd.extend(['-b', COOKIES_PATH])
             
-            logger.info(f"Downloading with curl...")
-            return_code = run_command(curl_cmd, timeout=900)
+            # Downloader bawaan: beberapa koneksi Range paralel + resume
+            headers = {
+                "User-Agent": ua,
+                "Referer": url,
+                "Accept": "*/*",
+                "Accept-Language": "en-US,en;q=0.9",
+                "Origin": "https://www.eporner.com",
+            }
+            cookies = cookie_header()
+            if cookies:
+                headers["Cookie"] = cookies
+            
+            sink = ProgressiveAudio() if PROGRESSIVE else None
+            logger.info("Downloading with ranged downloader...")
+            info = download_ranged(best_url, video_path, headers, sink=sink)
+            
+            if info is not None and os.path.getsize(video_path) > 5_000_000:
+                record_profile("download", info)
+                DOWNLOAD_INFO = dict(info, user_agent=ua)
+                logger.info(f"✓ Download successful! Size: {info['size'] / 1024 / 1024:.2f} MB")
+                if sink:
+                    STREAMED = sink.finish()
+                return video_path
+            
+            # Fallback: curl satu koneksi (server tanpa Range / ranged gagal).
+            # Partial ranged + progress map dibiarkan → worker yang di-retry melanjutkan dari sana
+            if sink:
+                sink.abort()
+            resumable = os.path.exists(video_path + ".progress.json")
+            curl_path = video_path[:-len(".mp4")] + ".curl.mp4" if resumable else video_path
+            sink = ProgressiveAudio() if PROGRESSIVE else None
+            if sink:
+                # curl → stdout → file + decoder audio (jalan bersamaan)
+                logger.info("Downloading with curl (progressive)...")
+                return_code = run_download_stream(curl_cmd + ['-o', '-'], curl_path, sink, timeout=900)
+            else:
+                logger.info("Downloading with curl...")
+                return_code = run_command(curl_cmd + ['-o', curl_path], timeout=900)
             
-            if return_code == 0 and os.path.exists(video_path) and os.path.getsize(video_path) > 5_000_000:
+            if return_code == 0 and os.path.exists(curl_path) and os.path.getsize(curl_path) > 5_000_000:
+                if resumable:
+                    os.replace(curl_path, video_path)
+                    os.remove(video_path + ".progress.json")
                 size_mb = os.path.getsize(video_path) / (1024 * 1024)
                 logger.info(f"✓ Download successful! Size: {size_mb:.2f} MB")
+                DOWNLOAD_INFO = {"url": best_url, "user_agent": ua}
+                if sink:
+                    STREAMED = sink.finish()
                 return video_path
             
-            # Cleanup
-            if os.path.exists(video_path):
-                os.remove(video_path)
+            if sink:
+                sink.abort()
+            
+            # Cleanup (hasil curl saja; partial ranged tetap untuk resume)
+            if os.path.exists(curl_path):
+                os.remove(curl_path)
                 
         except Exception as e:
-            logger.error(f"Error in attempt {idx}: {e}")
-            continue
-        
-        time.sleep(2)
+            logger.error(f"Download error in attempt {idx}: {e}")
     
     return None
 
@@ -477,6 +1227,22 @@ def download_video(url):
     """Main download function dengan multiple fallbacks"""
     logger.info(f"Starting download for: {url}")
     
+    final_path = os.path.join(JOB_DIR, "video.mp4")
+    
+    # Cek cache dulu (revalidasi ke server sebelum dipakai)
+    if DOWNLOAD_CACHE:
+        update("downloading", "Checking download cache...")
+        headers = {"Referer": url}
+        cookies = cookie_header()
+        if cookies:
+            headers["Cookie"] = cookies
+        try:
+            if download_cache.fetch(url, final_path, headers=headers):
+                JOB_META["download_cache"] = "hit"
+                return final_path
+        except Exception as e:
+            logger.warning(f"Download cache lookup failed: {e}")
+    
     # Coba metode yang berbeda
     methods = [
         ("Direct MP4 Scraping", scrape_eporner_direct),
@@ -501,6 +1267,12 @@ def download_video(url):
             if os.path.exists(final_path) and os.path.getsize(final_path) > 5_000_000:
                 size_mb = os.path.getsize(final_path) / (1024 * 1024)
                 logger.info(f"✓ Download SUCCESSFUL! Method: {method_name}, Size: {size_mb:.2f} MB")
+                if DOWNLOAD_CACHE:
+                    JOB_META["download_cache"] = "miss"
+                    try:
+                        download_cache.store(url, final_path, DOWNLOAD_INFO)
+                    except Exception as e:
+                        logger.warning(f"Download cache store failed: {e}")
                 return final_path
         
         logger.warning(f"Method {method_name} failed")
@@ -510,182 +1282,1961 @@ def download_video(url):
     return None
 
 # ======================================
-# PROCESSING FUNCTIONS (Audio, Transcribe, Translate, Burn)
+# AUDIO ONLY (job subtitle saja)
 # ======================================
-def extract_audio(video_path, audio_path):
-    """Extract audio dari video"""
-    logger.info(f"Extracting audio from {video_path}")
+def cookie_header():
+    """Cookies dari COOKIES_PATH sebagai nilai header 'Cookie' (untuk ffmpeg http)"""
+    pairs = []
+    if COOKIES_PATH and os.path.exists(COOKIES_PATH):
+        with open(COOKIES_PATH, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    parts = line.split('\t')
+                    if len(parts) >= 7:
+                        pairs.append(f"{parts[5]}={parts[6]}")
+    return "; ".join(pairs)
+
+def download_audio_ytdlp(url):
+    """yt-dlp dengan format audio-only (fallback: format video terkecil)"""
+    logger.info("Trying yt-dlp audio-only download...")
     
+    template = os.path.join(JOB_DIR, "audio_ytdlp.%(ext)s")
     cmd = [
-        FFMPEG, '-y', '-i', video_path,
-        '-vn', '-ac', '1', '-ar', '16000',
-        '-acodec', 'pcm_s16le',
-        '-loglevel', 'quiet',
-        '-hide_banner',
-        audio_path
+        'yt-dlp',
+        '-o', template,
+        '-f', 'bestaudio/worst',
+        '--user-agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36',
+        '--referer', url,
+        '--socket-timeout', '60',
+        '--retries', '10',
+        '--force-ipv4',
     ]
+    if COOKIES_PATH and os.path.exists(COOKIES_PATH):
+        cmd.extend(['--cookies', COOKIES_PATH])
+    cmd.append(url)
+    
+    if run_command(cmd, timeout=600) != 0:
+        return None
     
-    return run_command(cmd) == 0
+    for path in glob.glob(os.path.join(JOB_DIR, "audio_ytdlp.*")):
+        if not any(x in path.lower() for x in ['.part', '.ytdl', '.temp']):
+            logger.info(f"✓ Audio stream downloaded: {path} ({os.path.getsize(path) / 1024 / 1024:.2f} MB)")
+            return path
+    return None
 
-def transcribe_audio(audio_path, srt_path):
-    """Transcribe dengan fallback manual — 100% tidak kosong"""
-    update("transcribing", "Running Whisper transcription...")
+def acquire_audio(url):
+    """
+    Ambil audio saja tanpa menyimpan video:
+    1. URL MP4 langsung → ffmpeg baca track audio via HTTP range request
+    2. yt-dlp format audio-only → decode file kecil itu
+    """
+    logger.info(f"Acquiring audio only for: {url}")
     
-    try:
-        from faster_whisper import WhisperModel
-        
-        logger.info("Loading Whisper 'tiny' model...")
-        model = WhisperModel(
-            "tiny",
-            device="cpu",
-            compute_type="int8",
-            download_root="/tmp/whisper"
-        )
-        
-        logger.info("Transcribing (optimized for stability)...")
-        segments, info = model.transcribe(
-            audio_path,
-            beam_size=5,           # Kembali ke 5 biar akurat
-            best_of=5,
-            patience=1,
-            temperature=0,
-            vad_filter=True,       # VAD ON biar tidak ada silence kosong
-            vad_parameters=dict(min_silence_duration_ms=500)
-        )
-        
-        logger.info(f"Language: {info.language} ({info.language_probability:.2f})")
-        
-        # Manual write SRT (bypass pysubs2 bug)
-        with open(srt_path, "w", encoding="utf-8") as f:
-            for i, seg in enumerate(segments, 1):
-                start = seg.start
-                end = seg.end
-                text = seg.text.strip()
-                if not text:
-                    continue
-                    
-                h1 = int(start // 3600)
-                m1 = int((start % 3600) // 60)
-                s1 = int(start % 60)
-                ms1 = int((start * 1000) % 1000)
-                
-                h2 = int(end // 3600)
-                m2 = int((end % 3600) // 60)
-                s2 = int(end % 60)
-                ms2 = int((end * 1000) % 1000)
-                
-                f.write(f"{i}\n")
-                f.write(f"{h1:02d}:{m1:02d}:{s1:02d},{ms1:03d} --> {h2:02d}:{m2:02d}:{s2:02d},{ms2:03d}\n")
-                f.write(f"{text}\n\n")
-        
-        if os.path.getsize(srt_path) < 100:
-            logger.warning("SRT terlalu kecil, tambah dummy")
-            with open(srt_path, "a", encoding="utf-8") as f:
-                f.write("1\n00:00:01,000 --> 00:00:05,000\nSubtitle berhasil!\n")
-        
-        logger.info(f"SRT saved: {srt_path} ({os.path.getsize(srt_path)} bytes)")
-        return True
+    update("downloading", "Reading audio stream...")
+    for idx, ua, best_url in iter_direct_urls(url):
+        headers = {
+            "User-Agent": ua,
+            "Referer": url,
+            "Origin": "https://www.eporner.com",
+        }
+        cookies = cookie_header()
+        if cookies:
+            headers["Cookie"] = cookies
         
-    except Exception as e:
-        logger.error(f"Whisper failed: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
-        
-        # ULTIMATE FALLBACK: SRT dummy
-        with open(srt_path, "w", encoding="utf-8") as f:
-            f.write("1\n00:00:01,000 --> 00:00:05,000\n[Subtitle Indonesia]\n")
-        logger.info("Created dummy SRT")
-        return True
+        audio = extract_audio(best_url, headers=headers)
+        if audio is not None and len(audio) > SAMPLE_RATE:
+            return audio
+        logger.warning(f"Audio over HTTP failed in attempt {idx}")
+    
+    update("downloading", "Downloading audio stream...")
+    path = download_audio_ytdlp(url)
+    if path:
+        track_artifact(path, "download")
+        return extract_audio(path)
+    
+    logger.error("All audio-only methods failed")
+    return None
 
-def translate_subtitles(srt_path, target_lang="id"):
-    logger.info("Translating to Indonesian via LibreTranslate...")
+# ======================================
+# PROCESSING FUNCTIONS (Audio, Transcribe, Translate, Burn)
+# ======================================
+def extract_audio(video_path, headers=None):
+    """
+    Decode audio dari video langsung ke buffer float32 mono 16 kHz (tanpa WAV di disk).
+    `video_path` boleh URL http(s); `headers` dikirim ffmpeg ke server.
+    """
+    import numpy as np
+    
+    logger.info(f"Decoding audio into memory from {video_path[:200]}")
+    
+    cmd = [FFMPEG, '-nostdin']
+    if video_path.startswith("http"):
+        cmd += ['-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5']
+        if headers:
+            cmd += ['-headers', "".join(f"{k}: {v}\r\n" for k, v in headers.items())]
+    cmd += [
+        '-i', video_path,
+        '-vn', '-ac', '1', '-ar', str(SAMPLE_RATE),
+        '-acodec', 'pcm_s16le', '-f', 's16le',
+        '-loglevel', 'error',
+        '-hide_banner',
+        'pipe:1'
+    ]
     
+    returncode, stdout, stderr = capture_command(cmd, timeout=600)
+    if returncode == 0 and stdout:
+        # View int16 tanpa copy → satu buffer float32, dibagi in-place (peak = PCM + float32)
+        pcm = np.frombuffer(memoryview(stdout)[:len(stdout) - len(stdout) % 2], dtype=np.int16)
+        audio = pcm.astype(np.float32)
+        del pcm, stdout
+        audio /= 32768.0
+        logger.info(f"Audio decoded: {len(audio) / SAMPLE_RATE:.1f}s ({audio.nbytes / 1024 / 1024:.1f} MB in memory)")
+        return audio
+    logger.error(f"ffmpeg audio pipe failed (code {returncode}): {stderr[-500:]}")
+    
+    if CANCEL.is_set() or video_path.startswith("http"):
+        return None
+    
+    # Fallback: decode in-process dengan PyAV (dipakai faster-whisper juga)
     try:
-        import requests
-        
-        # Baca SRT manual
-        with open(srt_path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-        
-        translated_lines = []
-        current_text = []
-        
-        for line in lines:
-            line = line.strip()
-            if re.match(r"^\d+$", line) or "-->" in line:
-                if current_text:
-                    text = " ".join(current_text)
-                    translated = text
-                    for server in ["https://libretranslate.de", "https://translate.terraprint.co"]:
-                        try:
-                            r = requests.post(f"{server}/translate", json={
-                                "q": text, "source": "auto", "target": "id", "format": "text"
-                            }, timeout=10)
-                            if r.status_code == 200:
-                                translated = r.json()["translatedText"]
-                                break
-                        except:
-                            continue
-                    translated_lines.append(translated)
-                    current_text = []
-                translated_lines.append(line)
-            elif line:
-                current_text.append(line)
-            else:
-                translated_lines.append("")
-        
-        # Tulis ulang
-        out_path = os.path.join(JOB_DIR, "subs_indonesia.srt")
-        with open(out_path, "w", encoding="utf-8") as f:
-            f.write("\n".join(translated_lines))
-        
-        logger.info("Subtitle Indonesia berhasil!")
-        return out_path
-        
+        from faster_whisper.audio import decode_audio
+        logger.info("Falling back to PyAV decode...")
+        return decode_audio(video_path, sampling_rate=SAMPLE_RATE)
     except Exception as e:
-        logger.error(f"Translation failed: {e}")
-        return srt_path  # fallback
-
+        logger.error(f"PyAV decode failed: {e}")
+        return None
 
-def burn_subtitles(video_path, srt_path, output_path, font_size):
-    """Burn subtitle dengan path 100% aman"""
-    logger.info(f"Burning subtitles (size {font_size})...")
-    
-    # ESCAPE PATH YANG BENAR (ini yang bikin ffmpeg gagal sebelumnya)
-    srt_escaped = srt_path.replace("'", "'\\''").replace(" ", "\\ ").replace("(", "\\(").replace(")", "\\)")
-    
-    # Style sederhana tapi pasti jalan
-    style = f"FontSize={font_size},PrimaryColour=&H00FFFFFF,OutlineColour=&H80000000,BackColour=&H80000000,BorderStyle=3,Alignment=2,MarginV=40"
+def save_wav(audio, audio_path):
+    """Tulis buffer audio ke WAV 16-bit (hanya untuk debugging)"""
+    import wave
+    import numpy as np
     
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+    with wave.open(audio_path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm.tobytes())
+    logger.info(f"Debug WAV saved: {audio_path}")
+
+# ======================================
+# CUES - model subtitle ringkas (waktu int ms di array, teks di list)
+# ======================================
+SRT_CUE_RE = re.compile(
+    r"(\d+):(\d{2}):(\d{2})[,.](\d{1,3})[ \t]*-->[ \t]*(\d+):(\d{2}):(\d{2})[,.](\d{1,3})[^\n]*\n(.*?)(?=\n[ \t]*\n|\Z)",
+    re.S,
+)
+
+def _clock(ms, sep=","):
+    """ms → HH:MM:SS,mmm (SRT) / HH:MM:SS.mmm (VTT)"""
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}{sep}{ms:03d}"
+
+class Cues:
+    """
+    Tabel cue: starts/ends (int ms, array 'q') + texts (list str).
+    Semua stage (transcribe, translate, burn) bekerja di sini; file SRT/VTT/ASS hanya hasil serialisasi.
+    """
+    __slots__ = ("starts", "ends", "texts")
+    
+    def __init__(self, starts=(), ends=(), texts=()):
+        self.starts = array("q", starts)
+        self.ends = array("q", ends)
+        self.texts = list(texts)
+    
+    def __len__(self):
+        return len(self.texts)
+    
+    def append(self, start_ms, end_ms, text):
+        self.starts.append(start_ms)
+        self.ends.append(end_ms)
+        self.texts.append(text)
+    
+    @classmethod
+    def from_segments(cls, segments):
+        """Segment Whisper (start, end, text) dalam detik → Cues (dibulatkan ke ms terdekat)"""
+        cues = cls()
+        for start, end, text in segments:
+            text = text.strip()
+            if text:
+                cues.append(round(start * 1000), round(end * 1000), text)
+        return cues
+    
+    @classmethod
+    def parse_srt(cls, data):
+        """Parse teks SRT/VTT dalam satu pass regex (nomor urut & header diabaikan)"""
+        cues = cls()
+        data = data.replace("\r\n", "\n").replace("\r", "\n")
+        for match in SRT_CUE_RE.finditer(data):
+            h1, m1, s1, f1, h2, m2, s2, f2, text = match.groups()
+            text = text.strip()
+            if not text:
+                continue
+            start = ((int(h1) * 60 + int(m1)) * 60 + int(s1)) * 1000 + int(f1.ljust(3, "0"))
+            end = ((int(h2) * 60 + int(m2)) * 60 + int(s2)) * 1000 + int(f2.ljust(3, "0"))
+            cues.append(start, end, text)
+        return cues
+    
+    def with_texts(self, texts):
+        """Cues baru dengan timing sama dan teks lain (mis. hasil translate)"""
+        return Cues(self.starts, self.ends, texts)
+    
+    def intervals(self):
+        """Interval (start, end) dalam detik, urut"""
+        return sorted((s / 1000, e / 1000) for s, e in zip(self.starts, self.ends))
+    
+    def to_srt(self):
+        return "".join(
+            f"{i}\n{_clock(s)} --> {_clock(e)}\n{t}\n\n"
+            for i, (s, e, t) in enumerate(zip(self.starts, self.ends, self.texts), 1)
+        )
+    
+    def to_vtt(self):
+        return "WEBVTT\n\n" + "".join(
+            f"{_clock(s, '.')} --> {_clock(e, '.')}\n{t}\n\n"
+            for s, e, t in zip(self.starts, self.ends, self.texts)
+        )
+    
+    def to_ass(self, style=None, play_res=(384, 288)):
+        """ASS via pysubs2 dengan satu style 'Default' (`style` = pysubs2.SSAStyle, default libass kalau None)"""
+        import pysubs2
+        
+        subs = pysubs2.SSAFile()
+        subs.info["PlayResX"] = str(play_res[0])
+        subs.info["PlayResY"] = str(play_res[1])
+        subs.info["ScaledBorderAndShadow"] = "yes"
+        if style is not None:
+            subs.styles["Default"] = style
+        for s, e, t in zip(self.starts, self.ends, self.texts):
+            # Kurung kurawal = override tag di ASS → jangan sampai teks terjemahan ikut di-parse
+            subs.events.append(pysubs2.SSAEvent(start=s, end=e, text=t.replace("{", "(").replace("}", ")").replace("\n", "\\N")))
+        return subs.to_string("ass")
+    
+    def save(self, path, **kwargs):
+        """Tulis ke file; format dari ekstensi (.srt / .vtt / .ass)"""
+        ext = os.path.splitext(path)[1].lower()
+        data = self.to_vtt() if ext == ".vtt" else self.to_ass(**kwargs) if ext == ".ass" else self.to_srt()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(data)
+        return path
+
+# Batas konsolidasi: fragmen Whisper digabung jadi cue yang enak dibaca (dan 1 request translate per cue)
+CUE_MAX_GAP_MS = int(float(os.environ.get("CUE_MAX_GAP", "0.6")) * 1000)
+CUE_MIN_MS = int(float(os.environ.get("CUE_MIN_SECONDS", "1.5")) * 1000)
+CUE_MAX_MS = int(float(os.environ.get("CUE_MAX_SECONDS", "6")) * 1000)
+CUE_MAX_CHARS = int(os.environ.get("CUE_MAX_CHARS", "84"))   # ~2 baris x 42 karakter
+
+def consolidate_cues(cues, max_gap_ms=CUE_MAX_GAP_MS, max_ms=CUE_MAX_MS, max_chars=CUE_MAX_CHARS):
+    """
+    Gabung fragmen yang berdekatan selama gap, durasi dan panjang teks masih dalam batas.
+    Akhir kalimat (.?!) menutup cue kalau cue sudah cukup panjang (CUE_MIN_MS).
+    """
+    merged = Cues()
+    for start, end, text in zip(cues.starts, cues.ends, cues.texts):
+        text = " ".join(text.split())
+        if merged:
+            prev_start, prev_end, prev_text = merged.starts[-1], merged.ends[-1], merged.texts[-1]
+            sentence_done = prev_text.endswith((".", "?", "!")) and prev_end - prev_start >= CUE_MIN_MS
+            if (
+                not sentence_done
+                and start - prev_end <= max_gap_ms
+                and end - prev_start <= max_ms
+                and len(prev_text) + 1 + len(text) <= max_chars
+            ):
+                merged.ends[-1] = max(prev_end, end)
+                merged.texts[-1] = f"{prev_text} {text}"
+                continue
+        merged.append(start, end, text)
+    return merged
+
+def _split_words(text, parts):
+    """Bagi teks jadi `parts` potongan di batas kata, panjang potongan kira-kira sama"""
+    words = text.split()
+    target = len(text) / parts
+    pieces, current = [], []
+    position = 0   # posisi akhir kata terakhir di teks asli
+    for word in words:
+        # Batas potongan ke-n di sekitar n * target (kumulatif) → sisa tidak menumpuk di potongan terakhir
+        if current and len(pieces) < parts - 1 and position + 1 + len(word) / 2 > target * (len(pieces) + 1):
+            pieces.append(" ".join(current))
+            current = []
+        current.append(word)
+        position += len(word) + (1 if position else 0)
+    pieces.append(" ".join(current))
+    return pieces
+
+def split_long_cues(cues, max_chars=CUE_MAX_CHARS):
+    """Pecah cue yang terlalu panjang (mis. hasil translate lebih panjang) — waktu dibagi proporsional jumlah karakter"""
+    out = Cues()
+    for start, end, text in zip(cues.starts, cues.ends, cues.texts):
+        if len(text) <= max_chars or " " not in text:
+            out.append(start, end, text)
+            continue
+        parts = -(-len(text) // max_chars)
+        pieces = _split_words(text, parts)
+        # Kata panjang bisa mendorong potongan lewat batas → tambah potongan (maksimal satu per kata)
+        while max(len(piece) for piece in pieces) > max_chars and parts < len(text.split()):
+            parts += 1
+            pieces = _split_words(text, parts)
+        total = sum(len(piece) for piece in pieces)
+        cursor, done = start, 0
+        for piece in pieces:
+            done += len(piece)
+            piece_end = start + (end - start) * done // total
+            out.append(cursor, piece_end, piece)
+            cursor = piece_end
+    return out
+
+
+# ======================================
+# WHISPER - chunked parallel transcription
+# ======================================
+CPU_BUDGET = max(1, int(os.environ.get("CPU_BUDGET", os.cpu_count() or 1)))
+CHUNK_SECONDS = float(os.environ.get("WHISPER_CHUNK_SECONDS", "300"))   # durasi maksimal per chunk
+CHUNK_TIMEOUT = float(os.environ.get("WHISPER_CHUNK_TIMEOUT", "1800"))   # chunk yang lebih lama dianggap macet
+
+def select_preset(name):
+    """Aktifkan preset Whisper (setup_job memanggil ini dengan preset dari opsi job)"""
+    global PRESET_NAME, PRESET, WHISPER_OPTIONS
+    if name not in WHISPER_PRESETS:
+        logger.warning(f"Unknown preset '{name}', using '{DEFAULT_PRESET}'")
+        name = DEFAULT_PRESET
+    PRESET_NAME = name
+    PRESET = WHISPER_PRESETS[name]
+    WHISPER_OPTIONS = dict(
+        beam_size=PRESET["beam_size"],
+        best_of=PRESET["best_of"],
+        patience=PRESET["patience"],
+        temperature=0,
+        vad_filter=True,       # VAD ON biar tidak ada silence kosong
+        vad_parameters=PRESET["vad_parameters"]
+    )
+
+select_preset(DEFAULT_PRESET)
+
+# Model per proses (diisi oleh initializer pool / pemanggilan pertama)
+_whisper_model = None
+
+def load_whisper(cpu_threads=None):
+    """Load WhisperModel (sesuai preset) sekali per proses"""
+    global _whisper_model
+    if _whisper_model is None:
+        from faster_whisper import WhisperModel
+        
+        cpu_threads = cpu_threads or PRESET["cpu_threads"]
+        logger.info(f"Loading Whisper '{PRESET['model']}' model ({PRESET['compute_type']}, {cpu_threads} threads)...")
+        _whisper_model = WhisperModel(
+            PRESET["model"],
+            device="cpu",
+            compute_type=PRESET["compute_type"],
+            cpu_threads=cpu_threads,
+            download_root="/tmp/whisper"
+        )
+    return _whisper_model
+
+def _decode_two_pass(model, audio, pad=0.2):
+    """Pass 1 greedy; pass 2 beam search hanya untuk segment dengan confidence rendah"""
+    segments, info = model.transcribe(audio, **dict(WHISPER_OPTIONS, beam_size=1, best_of=1))
+    
+    results = []
+    redecoded = 0
+    for seg in segments:
+        text = seg.text.strip()
+        confident = (
+            seg.avg_logprob >= PRESET["logprob_threshold"]
+            and seg.compression_ratio <= PRESET["compression_ratio_threshold"]
+        )
+        if confident:
+            if text:
+                results.append((seg.start, seg.end, text))
+            continue
+        
+        # Decode ulang potongan audio segment ini dengan beam search
+        a = max(0, int((seg.start - pad) * SAMPLE_RATE))
+        b = min(len(audio), int((seg.end + pad) * SAMPLE_RATE))
+        retry, _ = model.transcribe(
+            audio[a:b],
+            **dict(
+                WHISPER_OPTIONS,
+                vad_filter=False,
+                language=info.language,
+                initial_prompt=results[-1][2] if results else None,
+            )
+        )
+        retry = [r for r in retry if r.text.strip()]
+        redecoded += 1
+        
+        if not retry:
+            if text:
+                results.append((seg.start, seg.end, text))
+            continue
+        
+        # Splice hasil beam search ke posisi segment asli (timestamp di-clamp)
+        offset = a / SAMPLE_RATE
+        for r in retry:
+            start = min(max(r.start + offset, seg.start), seg.end)
+            end = max(min(r.end + offset, seg.end), start)
+            results.append((start, end, r.text.strip()))
+    
+    return results, info, redecoded
+
+def _decode_chunk(audio, offset):
+    """Decode satu chunk audio; timestamp dikembalikan relatif ke awal file"""
+    model = load_whisper()
+    
+    if PRESET.get("two_pass"):
+        segments, info, redecoded = _decode_two_pass(model, audio)
+    else:
+        raw, info = model.transcribe(audio, **WHISPER_OPTIONS)
+        segments = [(seg.start, seg.end, seg.text.strip()) for seg in raw if seg.text.strip()]
+        redecoded = 0
+    
+    results = [(start + offset, end + offset, text) for start, end, text in segments]
+    duration = len(audio) / SAMPLE_RATE
+    return results, (info.language, info.language_probability, duration), redecoded
+
+# VAD pre-scan: region speech dideteksi sekali (numpy, tanpa model), Whisper hanya decode region itu
+VAD_PRESCAN = os.environ.get("VAD_PRESCAN", "1") == "1"
+VAD_FRAME = 480                                    # 30 ms
+VAD_SNR_DB = float(os.environ.get("VAD_SNR_DB", "12"))   # energi minimal di atas noise floor
+VAD_MIN_DB = -55.0                                 # dan di atas batas absolut (dBFS)
+VAD_BAND_RATIO = 0.35                              # porsi energi di pita suara 250–3500 Hz
+VAD_PAD = int(0.3 * SAMPLE_RATE)                   # padding tiap region speech
+VAD_MIN_SPEECH = int(0.25 * SAMPLE_RATE)
+VAD_MIN_SILENCE = int(0.8 * SAMPLE_RATE)           # jeda lebih pendek dari ini digabung
+VAD_JOIN_GAP = int(0.2 * SAMPLE_RATE)              # hening yang disisipkan antar region saat digabung
+VAD_FULL_RATIO = 0.9                               # speech > 90% chunk → decode chunk utuh saja
+
+def detect_speech(audio):
+    """
+    VAD energi + pita suara, vectorized per frame 30 ms.
+    Return array int64 (n, 2) interval [start, end) dalam sample.
+    """
+    import numpy as np
+    
+    count = len(audio) // VAD_FRAME
+    if count == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+    frames = audio[:count * VAD_FRAME].reshape(count, VAD_FRAME)
+    
+    energy = np.einsum("ij,ij->i", frames, frames) / VAD_FRAME
+    db = 10 * np.log10(energy + 1e-10)
+    floor, top = np.percentile(db, [10, 90])
+    if top - floor < VAD_SNR_DB and top > VAD_MIN_DB:
+        # Level hampir rata (music bed, noise kontinu): gate energi tidak bisa memisahkan speech
+        # → anggap semua speech, VAD Whisper sendiri yang memilah
+        return np.array([[0, len(audio)]], dtype=np.int64)
+    loud = db > max(floor + VAD_SNR_DB, VAD_MIN_DB)
+    
+    # Rasio energi pita suara — FFT hanya untuk frame yang cukup keras, per blok supaya memori tetap kecil
+    window = np.hanning(VAD_FRAME).astype(np.float32)
+    freqs = np.fft.rfftfreq(VAD_FRAME, 1 / SAMPLE_RATE)
+    band = (freqs >= 250) & (freqs <= 3500)
+    ratio = np.zeros(count, dtype=np.float32)
+    loud_frames = np.flatnonzero(loud)
+    for i in range(0, len(loud_frames), 8192):
+        idx = loud_frames[i:i + 8192]
+        power = np.square(np.abs(np.fft.rfft(frames[idx] * window, axis=1)))
+        ratio[idx] = power[:, band].sum(axis=1) / (power.sum(axis=1) + 1e-10)
+    voiced = loud & (ratio > VAD_BAND_RATIO)
+    
+    # Run frame voiced → interval sample, gabung jeda pendek dulu (suku kata 100–200 ms
+    # dipisah jeda singkat), baru buang region yang terlalu pendek, lalu padding
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], voiced.astype(np.int8), [0]))))
+    starts, ends = edges[0::2] * VAD_FRAME, edges[1::2] * VAD_FRAME
+    if len(starts) == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+    split = np.flatnonzero(starts[1:] - ends[:-1] > VAD_MIN_SILENCE)
+    starts = np.concatenate(([starts[0]], starts[split + 1]))
+    ends = np.concatenate((ends[split], [ends[-1]]))
+    keep = ends - starts >= VAD_MIN_SPEECH
+    starts, ends = starts[keep], ends[keep]
+    starts = np.maximum(starts - VAD_PAD, 0)
+    ends = np.minimum(ends + VAD_PAD, len(audio))
+    return np.stack([starts, ends], axis=1).astype(np.int64)
+
+def clip_intervals(speech, start, end):
+    """Interval speech yang jatuh di [start, end), relatif ke start"""
+    import numpy as np
+    
+    inside = speech[(speech[:, 1] > start) & (speech[:, 0] < end)]
+    return np.clip(inside, start, end) - start
+
+def compact_speech(audio, intervals):
+    """
+    Gabung region speech jadi satu buffer (dipisah hening pendek).
+    Return (buffer, mapping) dengan mapping = list (posisi di buffer, posisi asli, panjang) dalam sample.
+    """
+    import numpy as np
+    
+    pieces, mapping = [], []
+    silence = np.zeros(VAD_JOIN_GAP, dtype=audio.dtype)
+    position = 0
+    for start, end in intervals:
+        if pieces:
+            pieces.append(silence)
+            position += VAD_JOIN_GAP
+        mapping.append((position, int(start), int(end - start)))
+        pieces.append(audio[start:end])
+        position += int(end - start)
+    return np.concatenate(pieces), mapping
+
+def remap_time(seconds, mapping):
+    """Waktu di buffer compact → waktu di chunk asli (jatuh di hening sisipan → di-clamp ke region)"""
+    import bisect
+    
+    sample = seconds * SAMPLE_RATE
+    idx = max(0, bisect.bisect_right([m[0] for m in mapping], sample) - 1)
+    position, start, length = mapping[idx]
+    return (start + min(max(sample - position, 0), length)) / SAMPLE_RATE
+
+def save_speech(speech, audio_samples):
+    """Simpan interval speech ke speech.json (dipakai ulang chunking & analisis stage lain)"""
+    speech_samples = int(sum(end - start for start, end in speech))
+    data = {
+        "sample_rate": SAMPLE_RATE,
+        "audio_seconds": round(audio_samples / SAMPLE_RATE, 3),
+        "speech_seconds": round(speech_samples / SAMPLE_RATE, 3),
+        "intervals": [[round(start / SAMPLE_RATE, 3), round(end / SAMPLE_RATE, 3)] for start, end in speech],
+    }
+    try:
+        with open(os.path.join(JOB_DIR, "speech.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f)
+    except OSError as e:
+        logger.warning(f"Could not save speech intervals: {e}")
+    return data
+
+def _transcribe_chunk(job):
+    """
+    Entry point untuk proses pool: job = (start sample, audio, interval speech relatif chunk atau None).
+    Hanya region speech yang di-decode; timestamp di-remap ke posisi asli.
+    """
+    start, audio, speech = job
+    offset = start / SAMPLE_RATE
+    # Pre-scan tidak menemukan speech → jangan percaya begitu saja (speech pelan / di bawah musik),
+    # decode chunk utuh; VAD Whisper tetap membuang bagian yang benar-benar hening
+    if speech is None or len(speech) == 0 or int((speech[:, 1] - speech[:, 0]).sum()) >= VAD_FULL_RATIO * len(audio):
+        return _decode_chunk(audio, offset)
+    
+    compact, mapping = compact_speech(audio, speech)
+    segments, info, redecoded = _decode_chunk(compact, 0.0)
+    results = []
+    for seg_start, seg_end, text in segments:
+        a = remap_time(seg_start, mapping)
+        b = max(remap_time(seg_end, mapping), a)
+        results.append((a + offset, b + offset, text))
+    return results, info, redecoded
+
+def _init_whisper_worker(preset_name, cpu_threads):
+    """Initializer proses pool: proses baru tidak mewarisi preset job → pilih ulang, lalu load model"""
+    select_preset(preset_name)
+    load_whisper(cpu_threads)
+
+def whisper_pool(workers):
+    """
+    Process pool dengan satu WhisperModel per proses.
+    Context forkserver: worker tidak di-fork dari proses ini, yang bisa saja sedang punya thread
+    (download range, decoder) yang memegang lock logging/SSL → worker deadlock.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("forkserver"),
+        initializer=_init_whisper_worker,
+        initargs=(PRESET_NAME, max(1, CPU_BUDGET // workers)),
+    )
+
+def stop_pool(pool):
+    """Hentikan pool tanpa menunggu chunk yang macet (proses worker di-terminate)"""
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    record_pool_usage(pool)
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+def plan_chunks(audio, speech=None, max_seconds=CHUNK_SECONDS):
+    """Potong audio panjang di titik hening (interval VAD pre-scan) jadi chunk dengan durasi terbatas"""
+    total = len(audio)
+    max_samples = int(max_seconds * SAMPLE_RATE)
+    if total <= max_samples:
+        return [(0, total)]
+    
+    # Titik potong = tengah-tengah jeda antar region speech
+    if speech is None:
+        speech = detect_speech(audio)
+    cut_points = [int(prev_end + next_start) // 2 for (_, prev_end), (next_start, _) in zip(speech, speech[1:])]
+    
+    chunks = []
+    start = 0
+    while total - start > max_samples:
+        limit = start + max_samples
+        candidates = [c for c in cut_points if start < c <= limit]
+        end = candidates[-1] if candidates else limit
+        chunks.append((start, end))
+        start = end
+    chunks.append((start, total))
+    return chunks
+
+def stitch_segments(chunk_results, tolerance=0.5):
+    """Gabung hasil chunk (sudah ter-offset) dan buang duplikat di batas chunk"""
+    merged = []
+    for segments in chunk_results:
+        for start, end, text in segments:
+            if merged:
+                prev_start, prev_end, prev_text = merged[-1]
+                # Segment yang sama muncul di akhir chunk sebelumnya dan awal chunk berikutnya
+                if text.lower() == prev_text.lower() and start < prev_end + tolerance:
+                    merged[-1] = (prev_start, max(prev_end, end), prev_text)
+                    continue
+                start = max(start, prev_end)
+                if end <= start:
+                    continue
+            merged.append((start, end, text))
+    return merged
+
+def pick_language(infos):
+    """Pilih bahasa dominan dari semua chunk (bobot = probabilitas x durasi)"""
+    scores = {}
+    for language, probability, duration in infos:
+        scores[language] = scores.get(language, 0.0) + probability * duration
+    language = max(scores, key=scores.get)
+    total = sum(duration for _, _, duration in infos) or 1.0
+    return language, scores[language] / total
+
+def transcribe_audio(audio, stream=None):
+    """
+    Transcribe ke Cues, dengan fallback manual — 100% tidak kosong.
+    Kalau `stream` (StreamingTranscriber) diberikan, chunk sudah di-transcribe selama download.
+    """
+    from concurrent.futures import TimeoutError as PoolTimeout
+    
+    update("transcribing", "Running Whisper transcription...")
+    
+    try:
+        audio_seconds = len(audio) / SAMPLE_RATE
+        
+        if stream is not None:
+            started = stream.started
+            workers = stream.workers
+            logger.info(f"Collecting {audio_seconds:.1f}s streamed transcription (preset '{PRESET_NAME}')...")
+            outputs = stream.results()
+            chunks = outputs
+            speech = stream.speech_intervals()
+        else:
+            started = time.time()
+            speech = detect_speech(audio) if VAD_PRESCAN else None
+            chunks = plan_chunks(audio, speech)
+            workers = max(1, min(len(chunks), CPU_BUDGET // PRESET["cpu_threads"]))
+            jobs = [
+                (start, audio[start:end], clip_intervals(speech, start, end) if speech is not None else None)
+                for start, end in chunks
+            ]
+            
+            logger.info(f"Transcribing {audio_seconds:.1f}s audio (preset '{PRESET_NAME}') in {len(chunks)} chunk(s) with {workers} worker(s)...")
+            
+            if workers == 1:
+                load_whisper(cpu_threads=CPU_BUDGET)
+                outputs = [_transcribe_chunk(job) for job in jobs]
+            else:
+                pool = whisper_pool(workers)
+                try:
+                    rounds = -(-len(jobs) // workers)
+                    outputs = list(pool.map(_transcribe_chunk, jobs, timeout=CHUNK_TIMEOUT * rounds))
+                except BaseException:
+                    stop_pool(pool)
+                    raise
+                record_pool_usage(pool)
+                pool.shutdown()
+        
+        vad = save_speech(speech, len(audio)) if speech is not None else None
+        if vad:
+            logger.info(f"VAD pre-scan: {vad['speech_seconds']:.1f}s speech of {audio_seconds:.1f}s audio in {len(speech)} region(s)")
+        
+        segments = stitch_segments([segs for segs, _, _ in outputs])
+        language, probability = pick_language([info for _, info, _ in outputs])
+        redecoded = sum(count for _, _, count in outputs)
+        if PRESET.get("two_pass"):
+            logger.info(f"Two-pass decoding: {redecoded} low-confidence segment(s) re-decoded with beam search")
+        logger.info(f"Language: {language} ({probability:.2f})")
+        JOB_META["language"] = language
+        JOB_META["language_probability"] = round(probability, 3)
+        JOB_META["language_source"] = "whisper"
+        
+        # Realtime factor = waktu proses / durasi audio (< 1 berarti lebih cepat dari realtime)
+        elapsed = time.time() - started
+        rtf = elapsed / audio_seconds if audio_seconds else 0.0
+        logger.info(f"Transcription took {elapsed:.1f}s (RTF {rtf:.3f})")
+        record_profile("transcribe", {
+            "preset": PRESET_NAME,
+            "model": PRESET["model"],
+            "compute_type": PRESET["compute_type"],
+            "beam_size": PRESET["beam_size"],
+            "workers": workers,
+            "chunks": len(chunks),
+            "two_pass": bool(PRESET.get("two_pass")),
+            "streamed": stream is not None,
+            "vad_prescan": vad is not None,
+            "speech_seconds": vad["speech_seconds"] if vad else None,
+            "redecoded_segments": redecoded,
+            "audio_seconds": round(audio_seconds, 2),
+            "elapsed_seconds": round(elapsed, 2),
+            "realtime_factor": round(rtf, 4),
+        })
+        
+        cues = Cues.from_segments(segments)
+        if not cues:
+            logger.warning("Transcription kosong, tambah dummy")
+            cues.append(1000, 5000, "Subtitle berhasil!")
+        
+        logger.info(f"Transcription ready: {len(cues)} cue(s)")
+        return cues
+    
+    except PoolTimeout:
+        # Chunk macet (worker sudah di-terminate) → job gagal, bukan subtitle dummy
+        logger.error(f"Whisper chunk did not finish within {CHUNK_TIMEOUT:.0f}s")
+        raise
+    except (RuntimeError, OSError, MemoryError) as e:
+        # Kegagalan runtime Whisper/model (termasuk pool rusak) → dummy; bug kode tetap menggagalkan job
+        logger.error(f"Whisper failed: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+        
+        # ULTIMATE FALLBACK: subtitle dummy
+        logger.info("Created dummy subtitle")
+        return Cues([1000], [5000], ["[Subtitle Indonesia]"])
+
+# ======================================
+# PROGRESSIVE - audio & transcription jalan selama download
+# ======================================
+PROGRESSIVE = os.environ.get("PROGRESSIVE_DOWNLOAD", "1") == "1"   # bisa di-override opsi job "progressive"
+PROGRESSIVE_HEADER_LIMIT = 2 * 1024 * 1024   # maksimal byte yang ditahan untuk cek container
+
+# Hasil progressive dari download yang sukses: (audio, StreamingTranscriber)
+STREAMED = None
+
+def is_streamable(header):
+    """
+    Cek apakah container bisa di-decode dari pipe.
+    Return True / False, atau None kalau header belum cukup untuk memutuskan.
+    """
+    if len(header) < 12:
+        return None
+    if header[:4] == b'\x1a\x45\xdf\xa3':    # Matroska / WebM
+        return True
+    if header[:3] == b'FLV' or header[0] == 0x47:    # FLV / MPEG-TS
+        return True
+    if header[4:8] != b'ftyp':
+        return False
+    
+    # MP4: streamable hanya kalau 'moov' muncul sebelum 'mdat' (faststart)
+    pos = 0
+    while pos + 8 <= len(header):
+        size = int.from_bytes(header[pos:pos + 4], "big")
+        box = header[pos + 4:pos + 8]
+        if box == b'moov':
+            return True
+        if box == b'mdat':
+            return False
+        if size == 1:
+            if pos + 16 > len(header):
+                return None
+            size = int.from_bytes(header[pos + 8:pos + 16], "big")
+        if size < 8:
+            return False
+        pos += size
+    return None
+
+class StreamingTranscriber:
+    """Potong PCM yang terus bertambah jadi chunk dan transcribe di process pool"""
+    
+    def __init__(self):
+        self.started = time.time()
+        self.workers = max(1, CPU_BUDGET // PRESET["cpu_threads"])
+        self.pool = whisper_pool(self.workers)
+        # Start worker (dan load model) sekarang, paralel dengan download — tanpa menunggu
+        for _ in range(self.workers):
+            self.pool.submit(os.getpid)
+        self.pending = []
+        self.pending_samples = 0
+        self.offset = 0
+        self.futures = []
+        self.speech = []
+    
+    def add(self, pcm):
+        self.pending.append(pcm)
+        self.pending_samples += len(pcm)
+        chunk_samples = int(CHUNK_SECONDS * SAMPLE_RATE)
+        # Sisakan 10% lookahead supaya bisa potong di bagian paling hening
+        while self.pending_samples >= chunk_samples * 1.1:
+            self._submit(chunk_samples)
+    
+    def _submit(self, chunk_samples=None):
+        import numpy as np
+        
+        audio = np.concatenate(self.pending) if len(self.pending) > 1 else self.pending[0]
+        if chunk_samples is None:
+            cut = len(audio)
+        else:
+            cut = quietest_point(audio, int(chunk_samples * 0.9), chunk_samples)
+        
+        chunk = audio[:cut]
+        speech = detect_speech(chunk) if VAD_PRESCAN else None
+        if speech is not None:
+            self.speech.append(speech + self.offset)
+        self.futures.append(self.pool.submit(_transcribe_chunk, (self.offset, chunk, speech)))
+        logger.info(f"Streaming transcription: chunk {len(self.futures)} submitted at {self.offset / SAMPLE_RATE:.1f}s")
+        
+        self.offset += cut
+        rest = audio[cut:]
+        self.pending = [rest] if len(rest) else []
+        self.pending_samples = len(rest)
+    
+    def results(self):
+        """Submit sisa audio lalu tunggu semua chunk (urut)"""
+        try:
+            if self.pending_samples:
+                self._submit()
+            outputs = [future.result(timeout=CHUNK_TIMEOUT) for future in self.futures]
+        except BaseException:
+            stop_pool(self.pool)
+            raise
+        record_pool_usage(self.pool)
+        self.pool.shutdown()
+        return outputs
+    
+    def speech_intervals(self):
+        """Interval speech semua chunk (posisi sample di file), None kalau pre-scan mati"""
+        import numpy as np
+        
+        if not VAD_PRESCAN:
+            return None
+        return np.concatenate(self.speech) if self.speech else np.zeros((0, 2), dtype=np.int64)
+    
+    def abort(self):
+        stop_pool(self.pool)
+
+def quietest_point(audio, lo, hi, frame=1600):
+    """Sample index di tengah frame 100 ms paling hening antara lo dan hi"""
+    import numpy as np
+    
+    window = audio[lo:hi]
+    count = len(window) // frame
+    if count == 0:
+        return hi
+    energy = np.square(window[:count * frame].reshape(count, frame)).mean(axis=1)
+    return lo + int(np.argmin(energy)) * frame + frame // 2
+
+class ProgressiveAudio:
+    """
+    Sink untuk byte video yang sedang di-download.
+    Kalau container streamable, byte diteruskan ke ffmpeg (pipe) → PCM → StreamingTranscriber.
+    """
+    
+    def __init__(self):
+        from collections import deque
+        
+        self.header = bytearray()
+        self.enabled = True
+        self.process = None
+        self.reader = None
+        self.stderr_reader = None
+        self.stderr_tail = deque(maxlen=OUTPUT_TAIL_LINES)
+        self.transcriber = None
+        self.blocks = []
+        self.failed = False
+    
+    def feed(self, chunk):
+        if not self.enabled:
+            return
+        if self.process is None:
+            self.header.extend(chunk)
+            decision = is_streamable(bytes(self.header))
+            if decision is None and len(self.header) < PROGRESSIVE_HEADER_LIMIT:
+                return
+            if not decision:
+                logger.info("Progressive: container tidak streamable, audio diproses setelah download")
+                self.enabled = False
+                self.header = bytearray()
+                return
+            if not self._start():
+                self.enabled = False
+                self.header = bytearray()
+                return
+            chunk, self.header = bytes(self.header), bytearray()
+        try:
+            self.process.stdin.write(chunk)
+        except (BrokenPipeError, OSError) as e:
+            logger.warning(f"Progressive decoder stopped: {e}")
+            self.failed = True
+            self.enabled = False
+    
+    def _start(self):
+        logger.info("Progressive: streamable container, decoding audio while downloading")
+        self.transcriber = StreamingTranscriber()
+        cmd = [
+            FFMPEG, '-i', 'pipe:0',
+            '-vn', '-ac', '1', '-ar', str(SAMPLE_RATE),
+            '-acodec', 'pcm_s16le', '-f', 's16le',
+            '-loglevel', 'error', '-hide_banner',
+            'pipe:1'
+        ]
+        self.process = start_command(cmd, stdin=subprocess.PIPE)
+        if self.process is None:
+            self.failed = True
+            self.transcriber.abort()
+            return False
+        self.reader = threading.Thread(target=self._read, daemon=True)
+        self.reader.start()
+        self.stderr_reader = threading.Thread(target=_pump, args=(self.process.stderr, self.stderr_tail, None), daemon=True)
+        self.stderr_reader.start()
+        return True
+    
+    def _read(self):
+        import numpy as np
+        
+        leftover = b""
+        while True:
+            data = self.process.stdout.read(1 << 16)
+            if not data:
+                break
+            data = leftover + data
+            usable = len(data) - (len(data) % 2)
+            leftover = data[usable:]
+            pcm = np.frombuffer(data[:usable], dtype=np.int16).astype(np.float32) / 32768.0
+            self.blocks.append(pcm)
+            self.transcriber.add(pcm)
+    
+    def finish(self):
+        """Tutup pipe; return (audio, transcriber) atau None kalau progressive tidak jalan"""
+        import numpy as np
+        
+        if self.process is None:
+            return None
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.reader.join()
+        code = wait_command(self.process, timeout=300)
+        self.stderr_reader.join(timeout=5)
+        
+        if code != 0 or self.failed or not self.blocks:
+            error = "\n".join(self.stderr_tail)
+            logger.warning(f"Progressive decode failed (code {code}), falling back to full extraction: {error[-300:]}")
+            self.abort()
+            return None
+        
+        audio = np.concatenate(self.blocks)
+        logger.info(f"Progressive: {len(audio) / SAMPLE_RATE:.1f}s audio decoded during download, {len(self.transcriber.futures)} chunk(s) already submitted")
+        return audio, self.transcriber
+    
+    def abort(self):
+        if self.process is not None and self.process.returncode is None:
+            _kill_group(self.process, grace=2.0)
+            wait_command(self.process, timeout=5)
+        if self.transcriber is not None:
+            self.transcriber.abort()
+
+def run_download_stream(cmd, video_path, sink, timeout=900):
+    """
+    Jalankan downloader yang menulis ke stdout; byte ditulis ke file dan diteruskan ke sink.
+    Timeout/cancel ditangani wait_command (juga saat tidak ada data yang masuk).
+    """
+    from collections import deque
+    
+    process = start_command(cmd)
+    if process is None:
+        return -1
+    
+    stderr_tail = deque(maxlen=OUTPUT_TAIL_LINES)
+    errors = []
+    
+    def copy():
+        try:
+            with open(video_path, "wb") as out:
+                for chunk in iter(lambda: process.stdout.read(1 << 16), b""):
+                    out.write(chunk)
+                    sink.feed(chunk)
+        except Exception as e:
+            errors.append(e)
+            _kill_group(process, grace=2.0)
+    
+    readers = [
+        threading.Thread(target=copy, daemon=True),
+        threading.Thread(target=_pump, args=(process.stderr, stderr_tail, publish_progress), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+    
+    code = wait_command(process, timeout)
+    for reader in readers:
+        reader.join(timeout=60)
+    
+    if errors or readers[0].is_alive():
+        logger.error(f"Command error: {errors[0] if errors else 'output copy did not finish'}")
+        code = -1
+    JOB_META.pop("progress", None)
+    error = "\n".join(stderr_tail)
+    if error:
+        logger.error(f"STDERR: {error[-500:]}")
+    return code
+
+# ======================================
+# TRANSLATE (LibreTranslate)
+# ======================================
+TRANSLATE_SERVERS = [
+    s.strip().rstrip("/")
+    for s in os.environ.get("LIBRETRANSLATE_URLS", "https://libretranslate.de,https://translate.terraprint.co").split(",")
+    if s.strip()
+]
+# Di bawah confidence ini, bahasa dari Whisper tidak dipercaya → deteksi sekali per dokumen
+LANGUAGE_MIN_PROBABILITY = float(os.environ.get("LANGUAGE_MIN_PROBABILITY", "0.6"))
+
+def detect_document_language(texts):
+    """Deteksi bahasa sekali untuk seluruh subtitle (bukan per cue)"""
+    import requests
+    
+    sample = " ".join(texts)[:2000]
+    if not sample.strip():
+        return None
+    
+    for server in TRANSLATE_SERVERS:
+        try:
+            r = requests.post(f"{server}/detect", json={"q": sample}, timeout=10)
+            if r.status_code == 200:
+                detections = r.json()
+                if detections:
+                    best = detections[0]
+                    logger.info(f"Document language detected by {server}: {best['language']} ({best['confidence']})")
+                    return best["language"]
+        except Exception:
+            continue
+    return None
+
+def resolve_source_language(texts, language=None, probability=0.0):
+    """Pakai bahasa hasil Whisper; fallback ke satu deteksi dokumen kalau confidence rendah"""
+    if language and probability >= LANGUAGE_MIN_PROBABILITY:
+        return language
+    
+    logger.info(f"Whisper language '{language}' has low confidence ({probability:.2f}), detecting on whole document...")
+    detected = detect_document_language(texts)
+    if detected:
+        JOB_META["language"] = detected
+        JOB_META["language_source"] = "document-detect"
+        return detected
+    return language or "auto"
+
+def translate_subtitles(cues, target_lang="id", source_lang=None, source_probability=0.0):
+    """Translate teks Cues (timing tetap); return Cues baru, atau Cues asli kalau gagal/skip"""
+    logger.info(f"Translating to '{target_lang}' via LibreTranslate...")
+    
+    try:
+        import requests
+        
+        source = resolve_source_language(cues.texts, source_lang, source_probability)
+        logger.info(f"Translation source language: {source}")
+        
+        if source == target_lang:
+            logger.info("Source language sama dengan target, skip translation")
+            return cues
+        
+        state = {"source": source, "failed": 0}
+        
+        def translate_text(text):
+            for server in TRANSLATE_SERVERS:
+                try:
+                    r = requests.post(f"{server}/translate", json={
+                        "q": text, "source": state["source"], "target": target_lang, "format": "text"
+                    }, timeout=10)
+                    if r.status_code == 400 and state["source"] != "auto":
+                        # Bahasa hasil deteksi tidak didukung LibreTranslate (mis. haw, yue) → auto detect
+                        logger.warning(f"LibreTranslate rejected source '{state['source']}' ({r.text[:200]}), using 'auto'")
+                        state["source"] = "auto"
+                        return translate_text(text)
+                    if r.status_code == 200:
+                        return r.json()["translatedText"]
+                except:
+                    continue
+            state["failed"] += 1
+            return text
+        
+        translated = cues.with_texts(translate_text(text.replace("\n", " ")) for text in cues.texts)
+        JOB_META["translation_source"] = state["source"]
+        if state["failed"] == len(cues):
+            # Semua cue tetap teks asli → jangan dilaporkan sebagai terjemahan
+            JOB_META["translated"] = False
+            logger.warning(f"Translation to '{target_lang}' failed for every cue, subtitles stay untranslated")
+            return cues
+        if state["failed"]:
+            logger.warning(f"{state['failed']} of {len(cues)} cue(s) left untranslated")
+        JOB_META["translated"] = True
+        logger.info(f"Subtitle {state['source']} → {target_lang} berhasil! ({len(translated)} cue)")
+        return translated
+        
+    except Exception as e:
+        logger.error(f"Translation failed: {e}")
+        return cues  # fallback
+
+
+# ======================================
+# EMBEDDED SUBTITLES - pakai track teks di file source (tanpa Whisper)
+# ======================================
+REUSE_EMBEDDED_SUBTITLES = os.environ.get("REUSE_EMBEDDED_SUBTITLES", "1") == "1"
+
+# Codec subtitle berbasis teks (bitmap seperti PGS/dvdsub butuh OCR → tidak dipakai)
+TEXT_SUBTITLE_CODECS = ("subrip", "srt", "ass", "ssa", "mov_text", "webvtt", "text")
+
+# Tag bahasa ffprobe (ISO 639-2) → kode LibreTranslate (ISO 639-1)
+ISO639_2_TO_1 = {
+    "eng": "en", "ind": "id", "may": "ms", "msa": "ms", "jpn": "ja", "kor": "ko",
+    "chi": "zh", "zho": "zh", "spa": "es", "fre": "fr", "fra": "fr", "ger": "de", "deu": "de",
+    "por": "pt", "rus": "ru", "ara": "ar", "ita": "it", "tha": "th", "vie": "vi", "hin": "hi",
+    "tur": "tr", "dut": "nl", "nld": "nl", "pol": "pl", "ukr": "uk", "swe": "sv", "fil": "tl", "tgl": "tl",
+}
+
+def subtitle_language(stream):
+    """Kode bahasa 2 huruf dari tag stream, None kalau tidak ada / 'und'"""
+    tag = (stream.get("tags") or {}).get("language", "").lower()
+    if len(tag) == 2:
+        return tag
+    return ISO639_2_TO_1.get(tag)
+
+def pick_subtitle_stream(info):
+    """Track teks dengan bahasa dikenal; track default didahulukan, track 'forced' (hanya sebagian dialog) dilewati"""
+    candidates = []
+    for stream in (info or {}).get("streams", []):
+        if stream.get("codec_type") != "subtitle" or stream.get("codec_name") not in TEXT_SUBTITLE_CODECS:
+            continue
+        disposition = stream.get("disposition") or {}
+        language = subtitle_language(stream)
+        if language and not disposition.get("forced"):
+            candidates.append((not disposition.get("default"), stream["index"], stream, language))
+    if not candidates:
+        return None
+    _, _, stream, language = min(candidates, key=lambda c: c[:2])
+    return stream, language
+
+def embedded_subtitles(video_path):
+    """
+    Ambil subtitle teks yang sudah ada di file langsung ke Cues.
+    Return None kalau tidak ada track yang bisa dipakai (→ transcribe seperti biasa).
+    """
+    if not REUSE_EMBEDDED_SUBTITLES:
+        return None
+    
+    started = time.time()
+    picked = pick_subtitle_stream(probe_media(video_path))
+    if picked is None:
+        return None
+    stream, language = picked
+    
+    # ffmpeg konversi SRT/ASS/mov_text → SRT di stdout, sekali parse ke Cues
+    cmd = [FFMPEG, "-v", "error", "-i", video_path, "-map", f"0:{stream['index']}", "-f", "srt", "pipe:1"]
+    returncode, stdout, stderr = capture_command(cmd, timeout=120)
+    if returncode != 0:
+        logger.warning(f"Embedded subtitle extraction failed: {stderr[-300:]}")
+        return None
+    
+    cues = Cues.parse_srt(stdout.decode("utf-8", errors="ignore"))
+    # Tag styling (<i>, <font ...>) hasil konversi ASS/mov_text tidak ikut di-translate
+    cues = cues.with_texts(re.sub(r"</?[a-zA-Z][^>]*>", "", text).strip() for text in cues.texts)
+    if len(cues) < 3:
+        logger.info(f"Embedded subtitle track {stream['index']} has only {len(cues)} cue(s), ignoring")
+        return None
+    
+    JOB_META["language"] = language
+    JOB_META["language_probability"] = 1.0
+    JOB_META["language_source"] = "embedded"
+    elapsed = time.time() - started
+    record_profile("transcribe", {
+        "source": "embedded",
+        "stream_index": stream["index"],
+        "codec": stream.get("codec_name"),
+        "language": language,
+        "cues": len(cues),
+        "elapsed_seconds": round(elapsed, 3),
+    })
+    logger.info(f"Using embedded {stream.get('codec_name')} subtitle track {stream['index']} ({language}, {len(cues)} cues) in {elapsed:.2f}s")
+    return cues
+
+# ======================================
+# BURN SUBTITLES
+# ======================================
+FFPROBE = os.environ.get("FFPROBE", "ffprobe")
+
+# single = satu encode untuk seluruh video, parallel = per range GOP lalu concat,
+# smart = re-encode hanya GOP yang ada subtitle-nya, sisanya stream copy
+BURN_MODE = os.environ.get("BURN_MODE", "auto")   # bisa di-override opsi job "burn_mode"
+BURN_SEGMENT_THREADS = max(1, int(os.environ.get("BURN_SEGMENT_THREADS", "2")))   # thread x264 per proses segment
+BURN_MIN_SEGMENT_SECONDS = float(os.environ.get("BURN_MIN_SEGMENT_SECONDS", "30"))
+SMART_MAX_DIRTY_RATIO = float(os.environ.get("SMART_MAX_DIRTY_RATIO", "0.6"))   # di atas ini full encode lebih masuk akal
+
+# Profile H.264 source yang bisa disambung dengan output libx264
+X264_PROFILES = {
+    "Constrained Baseline": "baseline",
+    "Baseline": "baseline",
+    "Main": "main",
+    "High": "high",
+}
+DEFAULT_ENCODER_ARGS = ["-c:v", "libx264", "-preset", "veryfast", "-crf", "23"]
+
+# Encoding profile per tenant (env) — bisa di-override opsi job "encoding"
+ENCODING_PROFILE = os.environ.get("ENCODING_PROFILE", DEFAULT_ENCODING_PROFILE)
+
+# Encoding terpilih untuk burn job ini (diisi burn_subtitles lewat choose_encoding)
+ENCODING = None
+
+# Preview: potongan pendek & kecil supaya user bisa cek hasil sebelum full render selesai
+PREVIEW_ENABLED = True   # bisa dimatikan lewat opsi job "preview"
+PREVIEW_SECONDS = float(os.environ.get("PREVIEW_SECONDS", "60"))
+PREVIEW_HEIGHT = int(os.environ.get("PREVIEW_HEIGHT", "360"))
+RENDER_NICE = int(os.environ.get("RENDER_NICE", "10"))   # prioritas full render selama preview jalan
+
+# HLS: event playlist yang tumbuh selama encode (mpegts atau fmp4)
+HLS_DIR = None   # <JOB_DIR>/hls
+HLS_SEGMENT_SECONDS = float(os.environ.get("HLS_SEGMENT_SECONDS", "4"))
+HLS_SEGMENT_TYPE = os.environ.get("HLS_SEGMENT_TYPE", "mpegts")
+
+_preview_thread = None
+_preview_done = threading.Event()
+
+# Font dibundel di image (lihat Dockerfile) → libass tidak tergantung font sistem yang ada
+FONTS_DIR = os.environ.get("FONTS_DIR", os.path.join(APP_DIR, "fonts"))
+SUBTITLE_FONT = os.environ.get("SUBTITLE_FONT", "DejaVu Sans")
+
+def probe_media(path):
+    """ffprobe format + streams sebagai dict (None kalau gagal)"""
+    cmd = [FFPROBE, '-v', 'error', '-show_format', '-show_streams', '-of', 'json', path]
+    returncode, stdout, stderr = capture_command(cmd, timeout=60)
+    if returncode == 0:
+        try:
+            return json.loads(stdout)
+        except ValueError as e:
+            logger.error(f"ffprobe output invalid: {e}")
+            return None
+    logger.error(f"ffprobe failed: {stderr[-500:]}")
+    return None
+
+def probe_gops(path):
+    """
+    Struktur GOP video dari packet (urutan decode, tanpa decode frame).
+    Return (timestamp keyframe terurut, open_gop). Open GOP = ada packet setelah keyframe
+    (sebelum keyframe berikutnya) dengan pts lebih kecil → leading frame yang mereferensi GOP sebelumnya.
+    """
+    cmd = [
+        FFPROBE, '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=p=0',
+        path
+    ]
+    returncode, stdout, stderr = capture_command(cmd, timeout=300)
+    if returncode != 0:
+        logger.error(f"ffprobe keyframes failed: {stderr[-500:]}")
+        return [], False
+    
+    keyframes = []
+    open_gop = False
+    for line in stdout.decode("utf-8", errors="ignore").splitlines():
+        parts = line.strip().split(",")
+        try:
+            pts = float(parts[0])
+        except ValueError:
+            continue
+        if len(parts) >= 2 and parts[1].startswith("K"):
+            keyframes.append(pts)
+        elif len(keyframes) > 1 and pts < keyframes[-1]:
+            open_gop = True
+    return sorted(keyframes), open_gop
+
+def media_duration(info):
+    """Durasi (detik) dari hasil probe_media"""
+    try:
+        return float(info["format"]["duration"])
+    except (TypeError, KeyError, ValueError):
+        return 0.0
+
+def parse_rate(rate):
+    """Frame rate ffprobe ('30000/1001') → float, 0.0 kalau tidak valid"""
+    try:
+        num, _, den = str(rate).partition("/")
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+def choose_encoding(info, duration, threads=None):
+    """
+    Resolusi/fps output, preset x264 dan CRF dari source + encoding profile.
+    Preset = yang paling lambat (kualitas terbaik, maksimal X264_SLOWEST_AUTO_PRESET) yang estimasi
+    throughput-nya masih cukup untuk selesai dalam min(durasi x target_ratio, max_encode_seconds).
+    """
+    name = ENCODING_PROFILE if ENCODING_PROFILE in ENCODING_PROFILES else DEFAULT_ENCODING_PROFILE
+    profile = ENCODING_PROFILES[name]
+    threads = threads or CPU_BUDGET
+    video = next((s for s in (info or {}).get("streams", []) if s.get("codec_type") == "video"), {})
+    width, height = int(video.get("width") or 0), int(video.get("height") or 0)
+    fps = parse_rate(video.get("avg_frame_rate")) or parse_rate(video.get("r_frame_rate")) or 25.0
+    
+    filters = []
+    out_width, out_height, out_fps = width, height, fps
+    cap = profile["max_short_side"]
+    if cap and width and height and min(width, height) > cap:
+        factor = cap / min(width, height)
+        out_width, out_height = int(width * factor) // 2 * 2, int(height * factor) // 2 * 2
+        filters.append(f"scale={out_width}:{out_height}")
+    if profile["max_fps"] and fps > profile["max_fps"] + 0.01:
+        out_fps = float(profile["max_fps"])
+        filters.append(f"fps={profile['max_fps']}")
+    
+    # Throughput yang dibutuhkan (pixel/detik) untuk selesai dalam target waktu
+    target_seconds = min(max(duration, 1.0) * profile["target_ratio"], profile["max_encode_seconds"])
+    pixels = (out_width * out_height or 1280 * 720) * out_fps * max(duration, 1.0)
+    required = pixels / target_seconds
+    effective_threads = threads ** X264_THREAD_SCALING
+    preset = X264_PRESET_SPEED[0][0]
+    for candidate, speed in X264_PRESET_SPEED:
+        if speed * effective_threads < required:
+            break
+        preset = candidate
+        if candidate == X264_SLOWEST_AUTO_PRESET:
+            break
+    
+    # Resolusi tinggi menyembunyikan artefak, layar kecil butuh kualitas per pixel lebih
+    short_side = min(out_width, out_height)
+    crf = profile["crf"] + (1 if short_side >= 1080 else 0) - (1 if 0 < short_side <= 480 else 0)
+    
+    return {
+        "profile": name,
+        "source": {"width": width, "height": height, "fps": round(fps, 3)},
+        "output": {"width": out_width, "height": out_height, "fps": round(out_fps, 3)},
+        "filters": filters,
+        "preset": preset,
+        "crf": crf,
+        "threads": threads,
+        "target_seconds": round(target_seconds, 1),
+        "encoder_args": ["-c:v", "libx264", "-preset", preset, "-crf", str(crf)],
+    }
+
+def chosen_encoder_args():
+    """Argumen libx264 dari encoding terpilih (default lama kalau belum dipilih)"""
+    return ENCODING["encoder_args"] if ENCODING else DEFAULT_ENCODER_ARGS
+
+def video_filters(subs_path):
+    """Chain filter video: batas resolusi/fps dulu, baru subtitle (dirender di resolusi output)"""
+    return ",".join((ENCODING["filters"] if ENCODING else []) + [subtitle_filter(subs_path)])
+
+def plan_burn_ranges(keyframes, duration, parts):
+    """Bagi video jadi range yang mulai di keyframe, kira-kira sama panjang"""
+    import bisect
+    
+    bounds = [0.0]
+    for i in range(1, parts):
+        wanted = duration * i / parts
+        pos = bisect.bisect_left(keyframes, wanted)
+        candidates = keyframes[max(0, pos - 1):pos + 1]
+        if not candidates:
+            continue
+        kf = min(candidates, key=lambda k: abs(k - wanted))
+        if kf - bounds[-1] >= BURN_MIN_SEGMENT_SECONDS and duration - kf >= BURN_MIN_SEGMENT_SECONDS:
+            bounds.append(kf)
+    
+    ranges = list(zip(bounds, bounds[1:] + [None]))
+    return ranges
+
+def filter_path(path):
+    """Escape path untuk argumen filter ffmpeg"""
+    # ESCAPE PATH YANG BENAR (ini yang bikin ffmpeg gagal sebelumnya)
+    return path.replace("'", "'\\''").replace(" ", "\\ ").replace("(", "\\(").replace(")", "\\)")
+
+def burn_style(size):
+    """Style burn (kotak gelap semi transparan, bawah tengah) dengan font bundel"""
+    import pysubs2
+    
+    return pysubs2.SSAStyle(
+        fontname=SUBTITLE_FONT,
+        fontsize=float(size),
+        primarycolor=pysubs2.Color(255, 255, 255, 0),
+        outlinecolor=pysubs2.Color(0, 0, 0, 128),
+        backcolor=pysubs2.Color(0, 0, 0, 128),
+        borderstyle=3,
+        outline=2,
+        shadow=0,
+        marginv=40,
+    )
+
+def subtitle_filter(subs_path):
+    """Filter ffmpeg 'ass' (file ASS dibaca langsung oleh libass, font dari FONTS_DIR)"""
+    vf = f"ass='{filter_path(subs_path)}'"
+    if os.path.isdir(FONTS_DIR):
+        vf += f":fontsdir='{filter_path(FONTS_DIR)}'"
+    return vf
+
+def burn_range(video_path, subs_path, out_path, start, end, threads, encoder_args=None):
+    """Burn satu range waktu (tanpa audio); timeline subtitle digeser sesuai start"""
+    # setpts pertama mengembalikan timestamp ke waktu asli supaya cue yang benar muncul,
+    # setpts kedua mengembalikannya ke 0 untuk file potongan
+    vf = f"setpts=PTS+{start:.6f}/TB,{video_filters(subs_path)},setpts=PTS-STARTPTS"
+    
+    cmd = [FFMPEG, "-y", "-ss", f"{start:.6f}", "-i", video_path]
+    if end is not None:
+        cmd += ["-t", f"{end - start:.6f}"]
+    cmd += [
+        "-map", "0:v:0", "-an",
+        "-vf", vf,
+        *(encoder_args or chosen_encoder_args()),
+        "-threads", str(threads),
+        "-f", "mpegts",
+        out_path
+    ]
+    return run_command(cmd, timeout=600, nice=render_nice()) == 0 and os.path.exists(out_path)
+
+def copy_range(video_path, out_path, start, end):
+    """Stream copy satu range GOP (tanpa audio, tanpa re-encode)"""
+    cmd = [FFMPEG, "-y", "-ss", f"{start:.6f}", "-i", video_path]
+    if end is not None:
+        cmd += ["-t", f"{end - start:.6f}"]
+    cmd += ["-map", "0:v:0", "-an", "-c", "copy", "-f", "mpegts", out_path]
+    return run_command(cmd, timeout=600, nice=render_nice()) == 0 and os.path.exists(out_path)
+
+def concat_parts(part_paths, video_path, output_path):
+    """Concat potongan video (stream copy) + audio di-copy sekali dari source"""
+    list_file = os.path.join(os.path.dirname(part_paths[0]), "concat.txt")
+    with open(list_file, "w", encoding="utf-8") as f:
+        for path in part_paths:
+            escaped = path.replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    
+    cmd = [
+        FFMPEG, "-y",
+        "-f", "concat", "-safe", "0", "-i", list_file,
+        "-i", video_path,
+        "-map", "0:v:0", "-map", "1:a:0?",
+        "-c", "copy",
+        "-movflags", "+faststart",
+        output_path
+    ]
+    return run_command(cmd, timeout=600, nice=render_nice()) == 0 and os.path.exists(output_path)
+
+def burn_parallel(video_path, subs_path, output_path, ranges):
+    """Burn tiap range GOP di proses ffmpeg sendiri, lalu concat dengan stream copy"""
+    import shutil
+    from concurrent.futures import ThreadPoolExecutor
+    
+    parts_dir = os.path.join(JOB_DIR, "burn_parts")
+    os.makedirs(parts_dir, exist_ok=True)
+    threads = max(1, CPU_BUDGET // len(ranges))
+    
+    logger.info(f"Parallel burn: {len(ranges)} range(s), {threads} thread(s) each")
+    
+    try:
+        part_paths = [os.path.join(parts_dir, f"part_{i:03d}.ts") for i in range(len(ranges))]
+        with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+            results = list(pool.map(
+                lambda args: burn_range(video_path, subs_path, args[0], args[1][0], args[1][1], threads),
+                zip(part_paths, ranges)
+            ))
+        
+        if not all(results):
+            logger.error("Some burn ranges failed")
+            return False
+        
+        return concat_parts(part_paths, video_path, output_path)
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+# Parameter stream (SPS) yang harus sama antara part hasil x264 dan source supaya sambungan valid
+SPLICE_FIELDS = (
+    "codec_name", "profile", "level", "refs", "width", "height", "pix_fmt", "sample_aspect_ratio",
+    "field_order", "color_range", "color_space", "color_transfer", "color_primaries",
+)
+SPLICE_CHECK_SECONDS = 1.0   # decode +/- sekian detik di sekitar tiap sambungan
+
+def splice_params(stream):
+    """Nilai SPLICE_FIELDS dari stream ffprobe (tidak ada / 'unknown' dianggap sama)"""
+    return {field: str(stream.get(field, "unknown")) for field in SPLICE_FIELDS}
+
+def parameter_sets(extradata):
+    """SPS (NAL 7) dan PPS (NAL 8) dari extradata H.264, format avcC maupun Annex B"""
+    nals = []
+    if extradata[:1] == b"\x01" and len(extradata) >= 7:
+        # avcC: header 5 byte, lalu jumlah SPS + (len, data)..., jumlah PPS + (len, data)...
+        pos = 5
+        for mask in (0x1F, 0xFF):
+            if pos >= len(extradata):
+                break
+            count = extradata[pos] & mask
+            pos += 1
+            for _ in range(count):
+                size = int.from_bytes(extradata[pos:pos + 2], "big")
+                nals.append(bytes(extradata[pos + 2:pos + 2 + size]))
+                pos += 2 + size
+    else:
+        nals = [nal.lstrip(b"\x00") for nal in extradata.split(b"\x00\x00\x01")]
+    return [nal.rstrip(b"\x00") for nal in nals if nal and nal[0] & 0x1F in (7, 8)]
+
+def probe_parameter_sets(path):
+    """Parameter set stream video pertama (dari extradata ffprobe -show_data); None kalau gagal"""
+    cmd = [
+        FFPROBE, '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'stream=extradata', '-show_data', '-of', 'json', path
+    ]
+    returncode, stdout, stderr = capture_command(cmd, timeout=60)
+    if returncode != 0:
+        logger.error(f"ffprobe extradata failed: {stderr[-300:]}")
+        return None
+    try:
+        streams = json.loads(stdout).get("streams") or [{}]
+    except ValueError:
+        return None
+    # Hexdump ffprobe: "%08x: " lalu kolom hex selebar 41 karakter, sisanya ASCII
+    data = bytearray()
+    for line in (streams[0].get("extradata") or "").splitlines():
+        if len(line) > 10 and line[8:10] == ": ":
+            data += bytes.fromhex(line[10:51].replace(" ", ""))
+    return parameter_sets(bytes(data)) or None
+
+def smart_render_plan(info, keyframes, intervals, duration, open_gop=False):
+    """
+    Petakan cue ke struktur GOP source.
+    Return list run (start, end, dirty) atau None kalau splicing tidak mungkin / tidak worth it.
+    """
+    video = next((s for s in (info or {}).get("streams", []) if s.get("codec_type") == "video"), None)
+    if not video or video.get("codec_name") != "h264":
+        logger.info("Smart render: source bukan H.264, skip")
+        return None
+    if video.get("pix_fmt") not in ("yuv420p", "yuvj420p") or video.get("profile") not in X264_PROFILES:
+        logger.info(f"Smart render: profile {video.get('profile')} / {video.get('pix_fmt')} tidak bisa disambung, skip")
+        return None
+    if video.get("field_order") not in (None, "progressive", "unknown"):
+        logger.info(f"Smart render: source interlaced ({video['field_order']}), skip")
+        return None
+    if open_gop:
+        # Leading frame GOP yang di-copy akan mereferensi GOP hasil re-encode → rusak di sambungan
+        logger.info("Smart render: source pakai open GOP, skip")
+        return None
+    if len(keyframes) < 2 or duration <= 0:
+        return None
+    
+    # GOP = [keyframe_i, keyframe_i+1); GOP pertama selalu mulai dari 0
+    bounds = [0.0] + [k for k in keyframes if 0 < k < duration] + [duration]
+    runs = []
+    i = 0
+    for start, end in zip(bounds, bounds[1:]):
+        while i < len(intervals) and intervals[i][1] <= start:
+            i += 1
+        dirty = i < len(intervals) and intervals[i][0] < end
+        if runs and runs[-1][2] == dirty:
+            runs[-1] = (runs[-1][0], end, dirty)
+        else:
+            runs.append((start, end, dirty))
+    
+    dirty_seconds = sum(end - start for start, end, dirty in runs if dirty)
+    ratio = dirty_seconds / duration
+    logger.info(f"Smart render: {ratio:.0%} of the video overlaps subtitles ({len(runs)} runs)")
+    if ratio > SMART_MAX_DIRTY_RATIO:
+        return None
+    return runs
+
+def check_splices(output_path, boundaries, fps):
+    """
+    Decode frame di sekitar tiap titik sambung: harus tanpa error decoder dan jumlah frame
+    mendekati fps (frame leading yang hilang / referensi rusak ketahuan di sini).
+    """
+    window = SPLICE_CHECK_SECONDS
+    for boundary in boundaries:
+        start = max(0.0, boundary - window)
+        cmd = [
+            FFPROBE, '-v', 'error',
+            '-select_streams', 'v:0',
+            '-read_intervals', f"{start:.3f}%+{2 * window:.3f}",
+            '-show_entries', 'frame=pts_time',
+            '-of', 'csv=p=0',
+            output_path
+        ]
+        returncode, stdout, stderr = capture_command(cmd, timeout=120)
+        if returncode != 0 or stderr.strip():
+            logger.error(f"Splice at {boundary:.2f}s does not decode cleanly: {stderr.strip()[-300:]}")
+            return False
+        
+        frames = []
+        for line in stdout.decode("utf-8", errors="ignore").splitlines():
+            try:
+                frames.append(float(line.strip().rstrip(",")))
+            except ValueError:
+                continue
+        near = [t for t in frames if boundary - window / 2 <= t < boundary + window / 2]
+        if fps and len(near) < 0.8 * fps * window:
+            logger.error(f"Splice at {boundary:.2f}s: {len(near)} frame(s) in {window:.1f}s, expected ~{fps * window:.0f}")
+            return False
+    return True
+
+def burn_smart(video_path, subs_path, output_path, info, runs):
+    """Re-encode hanya run GOP yang ada subtitle-nya, stream copy sisanya, lalu concat"""
+    import shutil
+    from concurrent.futures import ThreadPoolExecutor
+    
+    video = next(s for s in info["streams"] if s.get("codec_type") == "video")
+    encoder_args = [
+        *chosen_encoder_args(),
+        "-profile:v", X264_PROFILES[video["profile"]],
+        "-pix_fmt", "yuv420p",
+    ]
+    level = video.get("level")
+    if isinstance(level, int) and level > 0:
+        encoder_args += ["-level", f"{level / 10:.1f}"]
+    refs = video.get("refs")
+    if isinstance(refs, int) and refs > 0:
+        encoder_args += ["-refs", str(refs)]
+    
+    parts_dir = os.path.join(JOB_DIR, "burn_parts")
+    os.makedirs(parts_dir, exist_ok=True)
+    workers = max(1, CPU_BUDGET // BURN_SEGMENT_THREADS)
+    
+    def render(args):
+        path, (start, end, dirty) = args
+        end = None if end >= runs[-1][1] else end
+        if dirty:
+            return burn_range(video_path, subs_path, path, start, end, BURN_SEGMENT_THREADS, encoder_args)
+        return copy_range(video_path, path, start, end)
+    
+    try:
+        part_paths = [os.path.join(parts_dir, f"part_{i:03d}.ts") for i in range(len(runs))]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(render, zip(part_paths, runs)))
+        
+        if not all(results):
+            return False
+        
+        # Part hasil x264 harus punya parameter stream yang sama dengan source (SPS/PPS kompatibel)
+        source_params = splice_params(video)
+        for path, (start, _, dirty) in zip(part_paths, runs):
+            if not dirty:
+                continue
+            part = next((s for s in (probe_media(path) or {}).get("streams", []) if s.get("codec_type") == "video"), {})
+            mismatch = {
+                field: (value, source_params[field])
+                for field, value in splice_params(part).items() if value != source_params[field]
+            }
+            if mismatch:
+                logger.error(f"Smart render: re-encoded part at {start:.2f}s differs from source: {mismatch}")
+                return False
+        
+        # Track mp4 hasil concat hanya menyimpan avcC part pertama → SPS/PPS semua part harus identik
+        first = probe_parameter_sets(part_paths[0])
+        for path, (start, _, _) in zip(part_paths[1:], runs[1:]):
+            if first is None or probe_parameter_sets(path) != first:
+                logger.error(f"Smart render: SPS/PPS of part at {start:.2f}s differ from the first part")
+                return False
+        
+        if not concat_parts(part_paths, video_path, output_path):
+            return False
+        
+        # Titik sambung harus bisa di-decode bersih, bukan hanya durasi total yang cocok
+        boundaries = [start for start, _, _ in runs[1:]]
+        fps = parse_rate(video.get("avg_frame_rate"))
+        if not check_splices(output_path, boundaries, fps):
+            return False
+        
+        # Pastikan hasil sambungan masih bisa dibaca dan durasinya cocok
+        out_duration = media_duration(probe_media(output_path))
+        source_duration = runs[-1][1]
+        if abs(out_duration - source_duration) > max(1.0, source_duration * 0.01):
+            logger.error(f"Smart render duration mismatch: {out_duration:.2f}s vs {source_duration:.2f}s")
+            return False
+        return True
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+def render_preview(video_path, subs_path, cues):
+    """Burn potongan pendek (di sekitar cue pertama), downscale, preset ultrafast"""
+    start = max(0.0, min(cues.starts) / 1000 - 2.0) if cues else 0.0
+    
+    preview_path = os.path.join(JOB_DIR, "preview.mp4")
+    tmp_path = os.path.join(JOB_DIR, "preview.tmp.mp4")
+    vf = (
+        f"setpts=PTS+{start:.6f}/TB,{subtitle_filter(subs_path)},setpts=PTS-STARTPTS,"
+        f"scale=-2:{PREVIEW_HEIGHT}"
+    )
+    cmd = [
+        FFMPEG, "-y",
+        "-ss", f"{start:.6f}", "-i", video_path,
+        "-t", f"{PREVIEW_SECONDS:.3f}",
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-vf", vf,
+        "-c:v", "libx264", "-preset", "ultrafast", "-crf", "28",
+        "-c:a", "aac", "-b:a", "96k",
+        "-movflags", "+faststart",
+        tmp_path
+    ]
+    
+    logger.info(f"Rendering preview ({PREVIEW_SECONDS:.0f}s from {start:.1f}s)...")
+    if run_command(cmd, timeout=300) == 0 and os.path.exists(tmp_path):
+        os.replace(tmp_path, preview_path)
+        JOB_META["preview"] = f"/api/jobs/{job_id}/preview"
+        refresh_status()
+        logger.info("Preview ready")
+        return True
+    
+    logger.warning("Preview render failed")
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    return False
+
+def start_preview(video_path, subs_path, cues):
+    """Render preview di background; full render jalan dengan prioritas lebih rendah"""
+    global _preview_thread
+    # HLS sudah bisa diputar beberapa detik setelah burn mulai → preview terpisah tidak perlu
+    if not PREVIEW_ENABLED or HLS_OUTPUT:
+        return None
+    _preview_done.clear()
+    
+    def run():
+        try:
+            render_preview(video_path, subs_path, cues)
+        finally:
+            _preview_done.set()
+            restore_render_priority()
+    
+    _preview_thread = threading.Thread(target=run, daemon=True)
+    _preview_thread.start()
+    return _preview_thread
+
+def render_nice():
+    """Niceness untuk proses full render (lebih rendah selama preview masih jalan)"""
+    if _preview_thread is not None and not _preview_done.is_set():
+        return RENDER_NICE
+    return 0
+
+def restore_render_priority():
+    """Preview selesai → process group render yang sudah jalan dikembalikan ke niceness 0"""
+    with _running_lock:
+        processes = [process for process in _running if getattr(process, "nice", 0) > 0]
+    for process in processes:
+        try:
+            # start_new_session → pid render = pgid-nya; cucu (mis. ffmpeg di bawah `nice`) ikut
+            os.setpriority(os.PRIO_PGRP, process.pid, 0)
+            process.nice = 0
+            logger.info(f"Preview done, render {process.label} (pgid {process.pid}) back to normal priority")
+        except ProcessLookupError:
+            pass
+        except PermissionError:
+            # Menaikkan prioritas butuh CAP_SYS_NICE / RLIMIT_NICE
+            logger.warning(f"Cannot renice render pgid {process.pid} back to 0 (no CAP_SYS_NICE)")
+
+def burn_single(video_path, subs_path, output_path):
+    """Satu encode libx264 untuk seluruh video"""
     # Command dengan kutip ganda + escape
     cmd = [
         FFMPEG, "-y",
+        "-progress", "pipe:1", "-nostats",
         "-i", video_path,
-        "-vf", f"subtitles='{srt_escaped}':force_style='{style}'",
-        "-c:v", "libx264",
-        "-preset", "veryfast",
-        "-crf", "23",
+        "-vf", video_filters(subs_path),
+        *chosen_encoder_args(),
+        "-threads", str(CPU_BUDGET),
         "-c:a", "copy",
         "-movflags", "+faststart",
         output_path
     ]
     
-    result = run_command(cmd, timeout=600)
+    return run_command(cmd, timeout=600, nice=render_nice()) == 0 and os.path.exists(output_path)
+
+def burn_hls(video_path, subs_path, playlist_path):
+    """
+    Satu encode ke segment HLS + playlist tipe event.
+    Keyframe dipaksa tiap HLS_SEGMENT_SECONDS supaya segment bisa dipotong tepat; URL playlist
+    masuk ke status begitu file pertama muncul.
+    """
+    os.makedirs(HLS_DIR, exist_ok=True)
+    fmp4 = HLS_SEGMENT_TYPE == "fmp4"
+    segment_name = "seg_%05d.m4s" if fmp4 else "seg_%05d.ts"
     
-    if result == 0 and os.path.exists(output_path):
-        size_mb = os.path.getsize(output_path) / (1024*1024)
-        logger.info(f"SUCCESS: Video dengan subtitle siap! ({size_mb:.1f} MB)")
+    cmd = [
+        FFMPEG, "-y",
+        "-progress", "pipe:1", "-nostats",
+        "-i", video_path,
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-vf", video_filters(subs_path),
+        *chosen_encoder_args(),
+        "-threads", str(CPU_BUDGET),
+        "-force_key_frames", f"expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS:g})",
+        "-c:a", "aac", "-b:a", "128k",
+        "-f", "hls",
+        "-hls_time", f"{HLS_SEGMENT_SECONDS:g}",
+        "-hls_playlist_type", "event",
+        "-hls_segment_type", HLS_SEGMENT_TYPE,
+        "-hls_flags", "independent_segments+temp_file",
+        "-hls_segment_filename", os.path.join(HLS_DIR, segment_name),
+    ]
+    if fmp4:
+        cmd += ["-hls_fmp4_init_filename", "init.mp4"]
+    cmd.append(playlist_path)
+    
+    def on_progress(event):
+        publish_progress(event)
+        if "hls" not in JOB_META and os.path.exists(playlist_path):
+            JOB_META["hls"] = f"/api/jobs/{job_id}/hls/{os.path.basename(playlist_path)}"
+            logger.info("HLS playlist available, playback can start")
+            refresh_status()
+    
+    if run_command(cmd, timeout=600, on_progress=on_progress) != 0 or not os.path.exists(playlist_path):
+        return False
+    
+    JOB_META["hls"] = f"/api/jobs/{job_id}/hls/{os.path.basename(playlist_path)}"
+    segments = len(glob.glob(os.path.join(HLS_DIR, "seg_*")))
+    logger.info(f"SUCCESS: HLS siap! ({segments} segment(s))")
+    return True
+
+def record_encoding(mode, duration, elapsed, encoded_seconds=None):
+    """
+    Simpan profile encoding terpilih + fps encode yang tercapai ke profile job.
+    encoded_seconds: durasi yang benar-benar di-encode (smart render: hanya run dirty, frame copy tidak dihitung).
+    """
+    encoded_seconds = duration if encoded_seconds is None else encoded_seconds
+    frames = encoded_seconds * ENCODING["output"]["fps"]
+    report = {key: ENCODING[key] for key in ("profile", "source", "output", "preset", "crf", "threads", "target_seconds")}
+    report.update({
+        "mode": mode,
+        "duration": round(duration, 2),
+        "encoded_seconds": round(encoded_seconds, 2),
+        "elapsed": round(elapsed, 2),
+        "encode_fps": round(frames / elapsed, 1) if elapsed > 0 else None,
+    })
+    record_profile("encode", report)
+    logger.info(
+        f"Encode {mode}: {report['encode_fps']} fps "
+        f"({elapsed:.1f}s, target {ENCODING['target_seconds']:.0f}s, preset {ENCODING['preset']})"
+    )
+
+def burn_subtitles(video_path, subs_path, output_path, cues):
+    """Burn subtitle dengan path 100% aman"""
+    global ENCODING
+    
+    info = probe_media(video_path)
+    duration = media_duration(info)
+    ENCODING = choose_encoding(info, duration)
+    output = ENCODING["output"]
+    logger.info(
+        f"Encoding profile {ENCODING['profile']}: {output['width']}x{output['height']}@{output['fps']:g} "
+        f"preset {ENCODING['preset']} crf {ENCODING['crf']} ({ENCODING['threads']} threads)"
+    )
+    started = time.monotonic()
+    
+    if HLS_OUTPUT:
+        logger.info(f"Burning subtitles to HLS ({HLS_SEGMENT_TYPE})...")
+        if not burn_hls(video_path, subs_path, output_path):
+            return False
+        record_encoding("hls", duration, time.monotonic() - started)
         return True
     
-    # Fallback tanpa style kalau masih error
-    logger.warning("Gagal dengan style → coba tanpa style...")
-    cmd_simple = f'{FFMPEG} -y -i "{video_path}" -vf "subtitles=\'{srt_escaped}\'" -c:v libx264 -crf 23 -c:a copy "{output_path}"'
-    if run_command(cmd_simple) == 0 and os.path.exists(output_path):
-        logger.info("SUCCESS: Subtitle ter-burn (tanpa style)")
+    logger.info(f"Burning subtitles (mode {BURN_MODE})...")
+    keyframes, open_gop = probe_gops(video_path) if info and BURN_MODE != "single" else ([], False)
+    
+    # Stream copy GOP bersih hanya sah kalau resolusi & fps output sama dengan source
+    if BURN_MODE in ("smart", "auto") and ENCODING["filters"]:
+        logger.info("Smart render: profile mengubah resolusi/fps, skip")
+    elif BURN_MODE in ("smart", "auto"):
+        runs = smart_render_plan(info, keyframes, cues.intervals(), duration, open_gop)
+        if runs:
+            if burn_smart(video_path, subs_path, output_path, info, runs):
+                size_mb = os.path.getsize(output_path) / (1024*1024)
+                logger.info(f"SUCCESS: Video dengan subtitle siap! ({size_mb:.1f} MB, smart render)")
+                dirty_seconds = sum(end - start for start, end, dirty in runs if dirty)
+                record_encoding("smart", duration, time.monotonic() - started, dirty_seconds)
+                return True
+            logger.warning("Smart render gagal → fallback ke full encode")
+    
+    if BURN_MODE in ("parallel", "smart", "auto"):
+        parts = min(max(1, CPU_BUDGET // BURN_SEGMENT_THREADS), int(duration // BURN_MIN_SEGMENT_SECONDS))
+        
+        if parts >= 2 and (BURN_MODE != "auto" or duration >= 4 * BURN_MIN_SEGMENT_SECONDS):
+            ranges = plan_burn_ranges(keyframes, duration, parts)
+            if len(ranges) >= 2:
+                if burn_parallel(video_path, subs_path, output_path, ranges):
+                    size_mb = os.path.getsize(output_path) / (1024*1024)
+                    logger.info(f"SUCCESS: Video dengan subtitle siap! ({size_mb:.1f} MB, parallel)")
+                    record_encoding("parallel", duration, time.monotonic() - started)
+                    return True
+                logger.warning("Parallel burn gagal → fallback ke single encode")
+    
+    if burn_single(video_path, subs_path, output_path):
+        size_mb = os.path.getsize(output_path) / (1024*1024)
+        logger.info(f"SUCCESS: Video dengan subtitle siap! ({size_mb:.1f} MB)")
+        record_encoding("single", duration, time.monotonic() - started)
         return True
     
     return False
 
+# ======================================
+# JOB SETUP - entry point (semua side effect job ada di sini)
+# ======================================
+def parse_flag(value, default=False):
+    """Opsi boolean job: bool, int, atau string "1"/"0"/"true"/"false"; selain itu → default"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        return value != 0
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in ("1", "true", "yes", "on"):
+            return True
+        if text in ("0", "false", "no", "off"):
+            return False
+    return default
+
+def setup_job(job, source, target_lang="id", url=False, size="24"):
+    """Siapkan job: directory, opsi dari options.json, logging ke worker.log, cookies"""
+    global job_id, src, target, is_url, font_size
+    global JOB_DIR, STATUS, LOG_FILE, COOKIES_TEMP, OPTIONS_FILE, PROFILE, OPTIONS, HLS_DIR
+    global SUBTITLES_ONLY, HLS_OUTPUT, PROGRESSIVE, BURN_MODE, PREVIEW_ENABLED, ENCODING_PROFILE
+    global COOKIES_PATH, JOB_USAGE_START
+    
+    job_id, src, target, is_url, font_size = job, source, target_lang, url, size
+    
+    JOB_DIR = os.path.join(APP_DIR, "output", job_id)
+    STATUS = os.path.join(JOB_DIR, "status.json")
+    LOG_FILE = os.path.join(JOB_DIR, "worker.log")
+    COOKIES_TEMP = os.path.join(JOB_DIR, "cookies_temp.txt")
+    OPTIONS_FILE = os.path.join(JOB_DIR, "options.json")
+    PROFILE = os.path.join(JOB_DIR, "profile.json")
+    HLS_DIR = os.path.join(JOB_DIR, "hls")
+    os.makedirs(JOB_DIR, exist_ok=True)
+    
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s] %(levelname)s: %(message)s',
+        datefmt='%H:%M:%S',
+        handlers=[
+            logging.FileHandler(LOG_FILE, encoding='utf-8'),
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+    
+    try:
+        with open(OPTIONS_FILE, "r", encoding="utf-8") as f:
+            OPTIONS = json.load(f)
+    except (OSError, ValueError):
+        OPTIONS = {}
+    
+    SUBTITLES_ONLY = OPTIONS.get("output") == "subtitles"
+    HLS_OUTPUT = OPTIONS.get("output") == "hls"
+    select_preset(OPTIONS.get("preset", DEFAULT_PRESET))
+    PROGRESSIVE = parse_flag(OPTIONS.get("progressive"), PROGRESSIVE)
+    PREVIEW_ENABLED = parse_flag(OPTIONS.get("preview"), PREVIEW_ENABLED)
+    BURN_MODE = OPTIONS.get("burn_mode", BURN_MODE)
+    if BURN_MODE not in BURN_MODES:
+        logger.warning(f"Unknown burn mode '{BURN_MODE}', using 'auto'")
+        BURN_MODE = "auto"
+    ENCODING_PROFILE = OPTIONS.get("encoding", ENCODING_PROFILE)
+    
+    COOKIES_PATH = setup_cookies()
+    JOB_USAGE_START = usage_snapshot()
+
 # ======================================
 # MAIN PROCESS
 # ======================================
@@ -709,40 +3260,110 @@ def main():
     
     logger.info(f"Processing URL: {final_url}")
     
-    # Step 2: Download video
-    update("downloading", "Downloading video...")
-    video_file = download_video(final_url)
+    # Cookies sementara hanya dipakai selama download
+    if COOKIES_PATH == COOKIES_TEMP:
+        track_artifact(COOKIES_TEMP, "download")
+    
+    # Step 2: Download video (upload lokal sudah ada di disk)
+    with stage("download"):
+        video_file = None
+        audio = None
+        stream = None
+        if is_url and SUBTITLES_ONLY:
+            # Job subtitle saja: ambil audio tanpa menyimpan video
+            audio = acquire_audio(final_url)
+        elif is_url:
+            update("downloading", "Downloading video...")
+            video_file = download_video(final_url)
+        else:
+            video_file = src if os.path.exists(src) else None
     
-    if not video_file:
+    if not video_file and audio is None:
         update("failed", "Video download failed")
         logger.error("❌ Download failed!")
         sys.exit(1)
     
-    # Step 3: Extract audio
-    update("processing", "Extracting audio...")
-    audio_file = os.path.join(JOB_DIR, "audio.wav")
+    # Source dibaca untuk audio dan burn; salinan cache (hard link) tetap ada setelah job copy dihapus
+    track_artifact(video_file, "audio", *(() if SUBTITLES_ONLY else ("burn",)))
     
-    if not extract_audio(video_file, audio_file):
-        update("failed", "Audio extraction failed")
-        sys.exit(1)
+    # Step 3: Subtitle teks yang sudah ada di file source → langsung ke translate
+    cues = None
+    embedded = False
+    if video_file and STREAMED is None:
+        with stage("embedded"):
+            cues = embedded_subtitles(video_file)
+        embedded = cues is not None
+        if embedded:
+            # Audio tidak perlu diambil → lepas klaim stage audio atas source
+            release_artifacts("audio")
     
-    # Step 4: Transcribe
-    update("transcribing", "Transcribing audio...")
-    raw_srt = os.path.join(JOB_DIR, "raw.srt")
+    if cues is None:
+        # Step 4: Extract audio (kalau belum di-decode selama download)
+        with stage("audio"):
+            if audio is None and STREAMED is not None:
+                audio, stream = STREAMED
+            elif audio is None:
+                update("processing", "Extracting audio...")
+                audio = extract_audio(video_file)
+        
+        if audio is None:
+            update("failed", "Audio extraction failed")
+            sys.exit(1)
+        
+        if DEBUG_AUDIO:
+            save_wav(audio, os.path.join(JOB_DIR, "audio.wav"))
+        
+        # Step 5: Transcribe
+        with stage("transcribe"):
+            update("transcribing", "Transcribing audio...")
+            cues = transcribe_audio(audio, stream=stream)
     
-    if not transcribe_audio(audio_file, raw_srt):
-        update("failed", "Transcription failed")
-        sys.exit(1)
+    # Step 6: Gabung fragmen Whisper → cue yang lebih penuh (lebih sedikit request translate & event libass).
+    # Cue dari track embedded sudah disusun untuk dibaca → dibiarkan apa adanya
+    fragments = len(cues)
+    if not embedded:
+        cues = consolidate_cues(cues)
+        logger.info(f"Consolidated {fragments} fragment(s) into {len(cues)} cue(s)")
     
-    # Step 5: Translate
-    update("translating", "Translating subtitles...")
-    translated_srt = translate_subtitles(raw_srt, target)
+    # Step 7: Translate
+    with stage("translate"):
+        update("translating", "Translating subtitles...")
+        cues = translate_subtitles(
+            cues, target,
+            source_lang=JOB_META.get("language"),
+            source_probability=JOB_META.get("language_probability", 0.0),
+        )
+        translated = len(cues)
+        cues = split_long_cues(cues)
+        record_profile("cues", {
+            "fragments": fragments,
+            "translated_cues": translated,
+            "final_cues": len(cues),
+        })
     
-    # Step 6: Burn subtitles
+    # Job subtitle saja: selesai di sini
+    if SUBTITLES_ONLY:
+        cues.save(os.path.join(JOB_DIR, "output.srt"))
+        sweep_partials()
+        update("done", "Subtitle ready for download!")
+        logger.info(f"✅ JOB COMPLETED (subtitles only): {job_id}")
+        return
+    
+    # Step 8: Burn subtitles
     update("burning", "Burning subtitles to video...")
-    output_file = os.path.join(JOB_DIR, "output.mp4")
+    output_file = os.path.join(HLS_DIR, "index.m3u8") if HLS_OUTPUT else os.path.join(JOB_DIR, "output.mp4")
+    
+    with stage("burn"):
+        # Satu-satunya file subtitle yang ditulis: ASS dengan style sudah di dalamnya, input filter 'ass'
+        subs_file = cues.save(os.path.join(JOB_DIR, "subs.ass"), style=burn_style(font_size))
+        track_artifact(subs_file, "burn")
+        preview = start_preview(video_file, subs_file, cues)
+        burned = burn_subtitles(video_file, subs_file, output_file, cues)
+        if preview is not None:
+            preview.join()
     
-    if burn_subtitles(video_file, translated_srt, output_file, font_size):
+    if burned:
+        sweep_partials()
         update("done", "Video ready for download!")
         logger.info(f"✅ JOB COMPLETED: {job_id}")
         logger.info(f"Output file: {output_file}")
@@ -750,16 +3371,36 @@ def main():
         update("failed", "Failed to burn subtitles")
         sys.exit(1)
 
+def _on_terminate(signum, frame):
+    """SIGTERM (cancel job) → kill semua process group anak, lalu keluar lewat KeyboardInterrupt"""
+    kill_running()
+    raise KeyboardInterrupt
+
 if __name__ == "__main__":
+    import signal
+    
+    # worker.py <job_id> <src> <target> <is_url 0/1> <font_size>
+    setup_job(sys.argv[1], sys.argv[2], sys.argv[3], bool(int(sys.argv[4])), sys.argv[5])
+    signal.signal(signal.SIGTERM, _on_terminate)
+    
     try:
         main()
     except KeyboardInterrupt:
         logger.info("Process interrupted by user")
+        kill_running()
+        sweep_partials(failed=True)
         update("cancelled", "Process cancelled")
         sys.exit(0)
+    except SystemExit as e:
+        # Pipeline sudah menulis status "failed" sebelum exit
+        if e.code:
+            sweep_partials(failed=True)
+        raise
     except Exception as e:
+        kill_running()
         logger.error(f"Unexpected error: {e}")
         import traceback
         logger.error(traceback.format_exc())
+        sweep_partials(failed=True)
         update("failed", f"Unexpected error: {str(e)}")
         sys.exit(1)
\ No newline at end of file